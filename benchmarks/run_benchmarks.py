@@ -0,0 +1,189 @@
+"""
+Benchmarks for the itinerary hot paths, on synthetic photos.
+
+Covers lire_exif, convertir_gps (scalar and batch), the route statistics,
+get_images_from_paths, copy_images_to_data, generate_itinerary_map,
+generate_compact_map and generate_simple_map_image.
+Reports throughput and peak Python memory (tracemalloc, measured in a
+separate pass) per benchmark and saves the results as JSON so runs can be
+compared between releases. Runs fully offline.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scale 1k
+    python benchmarks/run_benchmarks.py --scale 10 --compare benchmarks/results/previous.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+
+from synthetic_photos import SCALES, generate_photos  # noqa: E402
+
+from file_manager import get_images_from_paths, copy_images_to_data  # noqa: E402
+from gps_utils import convertir_gps, convertir_gps_lot, distance_cumulee, vitesses  # noqa: E402
+from image_handler import lire_exif, extraire_gps_brut, extraire_timestamp  # noqa: E402
+from map_plotter import generate_itinerary_map, generate_simple_map_image  # noqa: E402
+from compact_map import generate_compact_map  # noqa: E402
+from track import PhotoTrack  # noqa: E402
+
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def measure(name, items, function, repeat=1):
+    """
+    Run function() repeat times and keep the best wall time, then once more
+    under tracemalloc for the peak traced memory (tracing slows Python code
+    down several times, so it is never on while timing). Returns a result dict.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        "name": name,
+        "items": items,
+        "seconds": best,
+        "items_per_second": items / best if best else None,
+        "peak_memory_mb": peak / (1024 * 1024),
+    }
+    print(f"  {name:<28} {best * 1000:10.1f} ms  {result['items_per_second'] or 0:12.0f} /s"
+          f"  {result['peak_memory_mb']:8.1f} Mo")
+    return result
+
+
+def run(scale, work_dir, repeat):
+    count = SCALES[scale]
+    photos_dir = os.path.join(work_dir, "photos")
+    print(f"Génération de {count} photos synthétiques...")
+    paths = generate_photos(photos_dir, count)
+
+    results = []
+    results.append(measure("get_images_from_paths", count,
+                           lambda: get_images_from_paths([photos_dir]), repeat))
+    results.append(measure("lire_exif", count,
+                           lambda: [lire_exif(p) for p in paths], repeat))
+
+    exifs = [lire_exif(p) for p in paths]
+    gps_bruts = [extraire_gps_brut(e) for e in exifs]
+    gps_bruts = [g for g in gps_bruts if g]
+    results.append(measure("convertir_gps", len(gps_bruts),
+                           lambda: [convertir_gps(g) for g in gps_bruts], repeat))
+    results.append(measure("convertir_gps_lot", len(gps_bruts),
+                           lambda: convertir_gps_lot(gps_bruts), repeat))
+
+    store_dir = os.path.join(work_dir, "store")
+
+    def copy_fresh():
+        shutil.rmtree(store_dir, ignore_errors=True)
+        copy_images_to_data(paths, store_dir)
+
+    results.append(measure("copy_images_to_data", count, copy_fresh, repeat))
+    results.append(measure("copy_images_to_data (repeat)", count,
+                           lambda: copy_images_to_data(paths, store_dir), repeat))
+
+    points = []
+    for path, exif in zip(paths, exifs):
+        gps = extraire_gps_brut(exif)
+        coords = convertir_gps(gps) if gps else None
+        if coords:
+            timestamp = extraire_timestamp(exif)
+            points.append({
+                "filename": os.path.basename(path),
+                "latitude": coords[0],
+                "longitude": coords[1],
+                "timestamp": timestamp.isoformat() if timestamp else ""
+            })
+
+    track = PhotoTrack.from_points(points)
+
+    def route_stats():
+        distance_cumulee(track.lat, track.lon)
+        vitesses(track.lat, track.lon, track.timestamps)
+
+    results.append(measure("distance_cumulee + vitesses", len(points), route_stats, repeat))
+
+    output_dir = os.path.join(work_dir, "output")
+    results.append(measure("generate_itinerary_map", len(points),
+                           lambda: generate_itinerary_map(points, os.path.join(output_dir, "map.html")),
+                           repeat))
+    results.append(measure("generate_compact_map", len(points),
+                           lambda: generate_compact_map(points, os.path.join(output_dir, "compact.html"),
+                                                        template_folder=output_dir),
+                           repeat))
+    results.append(measure("generate_simple_map_image", len(points),
+                           lambda: generate_simple_map_image(points, os.path.join(output_dir, "map.png")),
+                           repeat))
+    return results
+
+
+def compare(results, previous_path):
+    """Print the speed ratio of each benchmark against a previous JSON run"""
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = {r["name"]: r for r in json.load(f)["results"]}
+
+    print(f"\nComparaison avec {previous_path}:")
+    for result in results:
+        old = previous.get(result["name"])
+        if not old or not result["seconds"]:
+            continue
+        ratio = old["seconds"] / result["seconds"]
+        print(f"  {result['name']:<28} x{ratio:6.2f}  "
+              f"({old['seconds'] * 1000:.1f} ms -> {result['seconds'] * 1000:.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline d'itinéraire")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/<date>.json)")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    parser.add_argument("--keep", help="generate photos in this folder and keep them")
+    args = parser.parse_args()
+
+    work_dir = args.keep or tempfile.mkdtemp(prefix="localy-bench-")
+    try:
+        results = run(args.scale, work_dir, args.repeat)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "scale": args.scale,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{args.scale}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nRésultats enregistrés : {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Synthetic geotagged photo generator for the benchmarks.
+
+Writes small JPEGs carrying realistic GPS / DateTime EXIF: a random walk
+around a start point, bursts of photos taken seconds apart, and a share of
+photos with missing GPS or date tags. Fully offline and deterministic for
+a given seed.
+
+Usage:
+    python benchmarks/synthetic_photos.py OUTPUT_DIR --count 1000 [--seed 42]
+"""
+import argparse
+import io
+import os
+import random
+import struct
+from datetime import datetime, timedelta
+
+from PIL import Image
+
+SCALES = {"10": 10, "1k": 1000, "100k": 100000}
+
+START_POSITION = (36.6830, 2.8828)
+START_TIME = datetime(2025, 11, 12, 8, 0, 0)
+
+
+def base_jpeg(width=64, height=48):
+    """A tiny JPEG body (without SOI) shared by every synthetic photo"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (120, 160, 200)).save(buffer, "JPEG", quality=70)
+    return buffer.getvalue()[2:]
+
+
+def to_dms(value):
+    """Decimal degrees -> ((d, 1), (m, 1), (s * 100, 100)) rationals"""
+    value = abs(value)
+    degrees = int(value)
+    minutes_float = (value - degrees) * 60
+    minutes = int(minutes_float)
+    seconds = round((minutes_float - minutes) * 60 * 100)
+    return ((degrees, 1), (minutes, 1), (seconds, 100))
+
+
+def exif_segment(lat=None, lon=None, taken_at=None):
+    """APP1 segment with the GPS IFD and DateTime tags (big endian TIFF)"""
+    exif = Image.Exif()
+    if taken_at is not None:
+        stamp = taken_at.strftime("%Y:%m:%d %H:%M:%S")
+        exif[0x0132] = stamp
+        exif.get_ifd(0x8769)[0x9003] = stamp
+    if lat is not None and lon is not None:
+        exif[0x8825] = {
+            1: "N" if lat >= 0 else "S",
+            2: tuple(n / d for n, d in to_dms(lat)),
+            3: "E" if lon >= 0 else "W",
+            4: tuple(n / d for n, d in to_dms(lon)),
+        }
+    payload = exif.tobytes()
+    if not payload.startswith(b"Exif\x00\x00"):
+        # Older Pillow versions return the bare TIFF block
+        payload = b"Exif\x00\x00" + payload
+    return b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+
+def generate_track(count, seed=42, burst_probability=0.1, missing_gps=0.05, missing_date=0.03):
+    """
+    Yield (lat, lon, taken_at) for count photos.
+    lat/lon or taken_at are None for the photos with missing tags.
+    """
+    rng = random.Random(seed)
+    lat, lon = START_POSITION
+    taken_at = START_TIME
+    burst_left = 0
+
+    for _ in range(count):
+        if burst_left:
+            burst_left -= 1
+            taken_at += timedelta(seconds=rng.randint(1, 3))
+            lat += rng.gauss(0, 0.00001)
+            lon += rng.gauss(0, 0.00001)
+        else:
+            if rng.random() < burst_probability:
+                burst_left = rng.randint(3, 15)
+            taken_at += timedelta(seconds=rng.randint(30, 900))
+            lat += rng.gauss(0, 0.0015)
+            lon += rng.gauss(0, 0.0015)
+
+        gps = None if rng.random() < missing_gps else (lat, lon)
+        date = None if rng.random() < missing_date else taken_at
+        yield (gps[0] if gps else None, gps[1] if gps else None, date)
+
+
+def generate_photos(output_dir, count, seed=42, per_folder=1000):
+    """
+    Write count synthetic JPEGs under output_dir (split in DCIM-like
+    sub-folders of per_folder files). Returns the list of paths.
+    """
+    body = base_jpeg()
+    paths = []
+    for i, (lat, lon, taken_at) in enumerate(generate_track(count, seed)):
+        folder = os.path.join(output_dir, f"{100 + i // per_folder}SYNTH")
+        if i % per_folder == 0:
+            os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"IMG_{i:06d}.jpg")
+        with open(path, "wb") as f:
+            f.write(b"\xff\xd8" + exif_segment(lat, lon, taken_at) + body)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic geotagged JPEGs")
+    parser.add_argument("output_dir")
+    parser.add_argument("--count", default="1k",
+                        help="number of photos, or one of: " + ", ".join(SCALES))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    count = SCALES.get(args.count) or int(args.count)
+    paths = generate_photos(args.output_dir, count, args.seed)
+    print(f"{len(paths)} photos générées dans {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Headless itinerary generation: no Tk, no display needed.
+
+Each trip folder gets its own output folder holding route_map.html,
+map_preview.png and summary.json. Trips are processed in parallel
+worker processes.
+
+Usage:
+    python src/batch_cli.py TRIP_DIR [TRIP_DIR ...] --output data/batch
+    python src/batch_cli.py --parent ~/Photos/Voyages --jobs 4 --offline
+    python src/batch_cli.py TRIP_DIR --compact-html --gzip
+    python src/batch_cli.py TRIP_DIR --append   # only read photos added since
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from itinerary_state import state_path
+from pipeline import ItineraryError, run_itinerary, itinerary_summary, write_summary
+from thumbnails import ThumbnailService
+from tracing import Tracer
+
+
+def trip_output_dirs(trips, output_root):
+    """
+    {trip: output folder}, named after the trip folder. Trips sharing a
+    folder name get a short hash of their full path appended, so none
+    overwrites another's output.
+    """
+    names = {trip: os.path.basename(os.path.normpath(trip)) for trip in trips}
+    taken = {}
+    for name in names.values():
+        taken[name] = taken.get(name, 0) + 1
+
+    output_dirs = {}
+    for trip, name in names.items():
+        if taken[name] > 1:
+            digest = hashlib.sha1(os.path.abspath(trip).encode("utf-8")).hexdigest()[:8]
+            name = f"{name}-{digest}"
+        output_dirs[trip] = os.path.join(output_root, name)
+    return output_dirs
+
+
+def process_trip(trip_dir, output_dir, ingestion_mode="reference", workers=None,
+                 offline=False, trace=False, thumbnails=False, html_format="folium",
+                 gzip_html=False, append=False):
+    """
+    Generate one trip's map, preview and summary.json.
+    append: only read the photos not in the trip's saved itinerary (a
+    full run is done when the trip has none yet).
+    Returns a status dict instead of raising, so one bad trip does not
+    stop the batch.
+    """
+    tracer = Tracer()
+    thumbnail_service = ThumbnailService(workers=workers or 2) if thumbnails else None
+    started = time.perf_counter()
+    try:
+        result = run_itinerary([trip_dir], output_dir=output_dir, ingestion_mode=ingestion_mode,
+                               tracer=tracer, workers=workers, offline=offline,
+                               thumbnails=thumbnail_service, html_format=html_format,
+                               gzip_html=gzip_html,
+                               append=append and os.path.exists(state_path(output_dir)))
+        summary = itinerary_summary(result)
+        summary["trip"] = trip_dir
+        write_summary(summary, os.path.join(output_dir, "summary.json"))
+        if trace:
+            tracer.export(os.path.join(output_dir, "pipeline_trace.json"))
+        status = {"trip": trip_dir, "ok": True, "points": summary["points"]}
+    except ItineraryError as e:
+        status = {"trip": trip_dir, "ok": False, "error": str(e)}
+    except Exception as e:
+        status = {"trip": trip_dir, "ok": False, "error": f"Erreur lors du traitement: {e}"}
+    finally:
+        if thumbnail_service is not None:
+            thumbnail_service.close()
+
+    status["seconds"] = time.perf_counter() - started
+    status["output"] = output_dir
+    return status
+
+
+def list_trips(trips, parents):
+    """Trip folders given directly, plus every sub-folder of the parents (each once)"""
+    found = list(trips)
+    for parent in parents:
+        found.extend(
+            entry.path for entry in sorted(os.scandir(parent), key=lambda e: e.name)
+            if entry.is_dir() and not entry.name.startswith(".")
+        )
+    unique = {}
+    for trip in found:
+        unique.setdefault(os.path.abspath(trip), trip)
+    return list(unique.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génération d'itinéraires sans interface")
+    parser.add_argument("trips", nargs="*", help="trip folders (one itinerary each)")
+    parser.add_argument("--parent", action="append", default=[],
+                        help="process every sub-folder of this folder as a trip")
+    parser.add_argument("--output", default="data/batch", help="output root folder")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="trips processed in parallel (default: CPU count)")
+    parser.add_argument("--copy", action="store_true",
+                        help="store the photos in data/images before reading them")
+    parser.add_argument("--offline", action="store_true",
+                        help="never download map tiles (cached tiles or plain preview)")
+    parser.add_argument("--thumbnails", action="store_true",
+                        help="show photo thumbnails in the map popups")
+    parser.add_argument("--compact-html", action="store_true",
+                        help="minified shared map page plus a packed data file")
+    parser.add_argument("--gzip", action="store_true",
+                        help="also write .gz copies of the compact map files")
+    parser.add_argument("--append", action="store_true",
+                        help="only read the photos added since the previous run of each trip")
+    parser.add_argument("--trace", action="store_true",
+                        help="write each trip's pipeline_trace.json")
+    args = parser.parse_args(argv)
+
+    trips = list_trips(args.trips, args.parent)
+    if not trips:
+        parser.error("aucun dossier de voyage indiqué")
+
+    cpus = os.cpu_count() or 1
+    jobs = max(1, min(args.jobs or cpus, len(trips)))
+    # Split the cores between trips rather than oversubscribing them
+    workers = max(1, cpus // jobs)
+    ingestion_mode = "copy" if args.copy else "reference"
+    html_format = "compact" if args.compact_html else "folium"
+    if args.gzip and not args.compact_html:
+        parser.error("--gzip nécessite --compact-html")
+
+    output_dirs = trip_output_dirs(trips, args.output)
+
+    print(f"{len(trips)} voyage(s), {jobs} en parallèle")
+    statuses = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(process_trip, trip, output_dirs[trip], ingestion_mode, workers,
+                                   args.offline, args.trace, args.thumbnails, html_format,
+                                   args.gzip, args.append)
+                   for trip in trips]
+        for future in as_completed(futures):
+            status = future.result()
+            statuses.append(status)
+            if status["ok"]:
+                print(f"✅ {status['trip']} : {status['points']} points ({status['seconds']:.1f} s)")
+            else:
+                print(f"❌ {status['trip']} : {status['error']}")
+
+    os.makedirs(args.output, exist_ok=True)
+    statuses.sort(key=lambda s: s["trip"])
+    with open(os.path.join(args.output, "batch_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(statuses, f, indent=2, ensure_ascii=False)
+
+    failed = sum(1 for s in statuses if not s["ok"])
+    print(f"{len(statuses) - failed} itinéraire(s) générés, {failed} échec(s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
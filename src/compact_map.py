@@ -0,0 +1,286 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from file_manager import ensure_output_folder, place_in_store, remove_if_exists
+from map_plotter import (DEFAULT_SIMPLIFY_TOLERANCE_M, DEFAULT_ZOOM_LEVELS, MARKERS_MAX_POINTS,
+                         ZOOM_LEVELS_MIN_POINTS, route_levels)
+from track import as_track
+
+# Sidecar written next to the page: route_map.html -> route_map.data.js
+DATA_SUFFIX = ".data.js"
+DATA_FORMAT_VERSION = 1
+# Coordinates are stored as integer micro-degrees (~0.1 m), delta-encoded
+COORD_SCALE = 10 ** 6
+
+DEFAULT_TEMPLATE_FOLDER = "data/cache"
+
+# The page is the same for every trip: it loads the sidecar named after
+# itself, so one template file can be linked into every output folder.
+# Statements all end with ";" or "}" because minify() joins the lines.
+PAGE_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Itinéraire</title>
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css">
+<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/leaflet.markercluster/1.1.0/MarkerCluster.css">
+<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/leaflet.markercluster/1.1.0/MarkerCluster.Default.css">
+<style>
+    html, body, #map { width: 100%; height: 100%; margin: 0; padding: 0; }
+</style>
+<script src="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js"></script>
+<script src="https://cdnjs.cloudflare.com/ajax/libs/leaflet.markercluster/1.1.0/leaflet.markercluster.js"></script>
+</head>
+<body>
+<div id="map"></div>
+<script>
+(function() {
+    var map = L.map("map", {preferCanvas: true}).setView([46.5, 2.5], 5);
+    L.tileLayer("https://tile.openstreetmap.org/{z}/{x}/{y}.png", {
+        maxZoom: 19,
+        attribution: "&copy; OpenStreetMap contributors"
+    }).addTo(map);
+
+    function undelta(values, scale) {
+        var out = new Array(values.length), sum = 0;
+        for (var i = 0; i < values.length; i++) {
+            if (values[i] !== null) {
+                sum += values[i];
+                out[i] = sum / scale;
+            } else {
+                out[i] = null;
+            }
+        }
+        return out;
+    }
+    function escapeHtml(text) {
+        return String(text).replace(/[&<>"']/g, function(c) {
+            return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c];
+        });
+    }
+    function pad(n) {
+        return (n < 10 ? "0" : "") + n;
+    }
+    function formatDate(minutes) {
+        var d = new Date(minutes * 60000);
+        return pad(d.getUTCDate()) + "/" + pad(d.getUTCMonth() + 1) + "/" + d.getUTCFullYear() +
+            " " + pad(d.getUTCHours()) + ":" + pad(d.getUTCMinutes());
+    }
+
+    window.localyTrack = function(data) {
+        var lat = undelta(data.lat, data.s), lon = undelta(data.lon, data.s);
+        var times = undelta(data.t, 1), total = lat.length;
+        var thumbnails = data.i || [];
+
+        data.z.forEach(function(level) {
+            var indices = undelta(level[1], 1), line = new Array(indices.length);
+            for (var k = 0; k < indices.length; k++) {
+                line[k] = [lat[indices[k]], lon[indices[k]]];
+            }
+            level[1] = L.polyline(line, {color: "#173DED", weight: 4, opacity: 0.8});
+        });
+        function updateRoute() {
+            var zoom = map.getZoom(), chosen = data.z[0][1];
+            data.z.forEach(function(level) {
+                if (zoom >= level[0]) {
+                    chosen = level[1];
+                }
+            });
+            data.z.forEach(function(level) {
+                if (level[1] === chosen) {
+                    if (!map.hasLayer(level[1])) {
+                        map.addLayer(level[1]);
+                    }
+                } else if (map.hasLayer(level[1])) {
+                    map.removeLayer(level[1]);
+                }
+            });
+        }
+        map.on("zoomend", updateRoute);
+
+        function tooltip(layer) {
+            var n = layer.options.n;
+            var label = n === 1 ? "Départ" : (n === total ? "Arrivée" : "Point " + n);
+            return label + ": " + escapeHtml(data.f[n - 1]);
+        }
+        function popup(layer) {
+            var n = layer.options.n, thumbnail = thumbnails[n - 1], time = times[n - 1];
+            return '<div style="font-family: Arial, sans-serif;"><b>Point ' + n + '</b><br>' +
+                (thumbnail ? '<img src="' + escapeHtml(data.ip + thumbnail) +
+                    '" style="max-width: 160px; display: block;"><br>' : '') +
+                '<small>' + escapeHtml(data.f[n - 1]) + '</small><br>' +
+                (time !== null ? '<small>📅 ' + formatDate(time) + '</small>' : '') + '</div>';
+        }
+        var markers = new Array(total);
+        for (var i = 0; i < total; i++) {
+            var n = i + 1, end = n === 1 || n === total;
+            markers[i] = L.circleMarker([lat[i], lon[i]], {
+                n: n, radius: end ? 9 : 7, color: "white", weight: 2, fillOpacity: 1,
+                fillColor: n === 1 ? "#10b981" : (n === total ? "#ef4444" : "#3b82f6")
+            }).bindTooltip(tooltip).bindPopup(popup, {maxWidth: 300});
+        }
+        if (data.c) {
+            var cluster = L.markerClusterGroup({chunkedLoading: true});
+            cluster.addLayers(markers);
+            map.addLayer(cluster);
+        } else {
+            L.featureGroup(markers).addTo(map);
+        }
+
+        map.fitBounds(data.b);
+        updateRoute();
+    };
+
+    var name = decodeURIComponent(location.pathname.split("/").pop()).replace(/\\.html?$/, "");
+    var script = document.createElement("script");
+    script.src = encodeURIComponent(name || "route_map") + "DATA_SUFFIX";
+    document.body.appendChild(script);
+})();
+</script>
+</body>
+</html>
+""".replace("DATA_SUFFIX", DATA_SUFFIX)
+
+
+def minify(text):
+    """Drop indentation and line breaks (the template is written for it)"""
+    return "".join(line.strip() for line in text.splitlines())
+
+
+def delta_encode(values):
+    """Integers -> first value then differences (small numbers, pack and gzip well)"""
+    values = np.asarray(values, dtype=np.int64)
+    if len(values) == 0:
+        return []
+    return np.diff(values, prepend=0).tolist()
+
+
+def encode_times(track):
+    """Delta-encoded minutes since the epoch, null for undated photos"""
+    encoded = []
+    previous = 0
+    for i in range(len(track)):
+        if not track.has_timestamp(i):
+            encoded.append(None)
+            continue
+        minutes = int(track.timestamps[i]) // 60
+        encoded.append(minutes - previous)
+        previous = minutes
+    return encoded
+
+
+def pack_track(track, thumbnails=None, simplify_tolerance_m=DEFAULT_SIMPLIFY_TOLERANCE_M,
+               zoom_levels="auto"):
+    """
+    Columnar, delta-encoded data for the compact page:
+    lat/lon in micro-degrees, t in minutes, f filenames, i thumbnail URLs
+    (after the common prefix ip), z route levels as point indices,
+    b the bounds and c whether markers are clustered.
+    """
+    if zoom_levels == "auto":
+        zoom_levels = DEFAULT_ZOOM_LEVELS if len(track) >= ZOOM_LEVELS_MIN_POINTS else None
+    levels = route_levels(track.lat, track.lon, simplify_tolerance_m, zoom_levels)
+
+    min_lat, max_lat, min_lon, max_lon = track.bounds()
+    data = {
+        "v": DATA_FORMAT_VERSION,
+        "s": COORD_SCALE,
+        "lat": delta_encode(np.rint(track.lat * COORD_SCALE)),
+        "lon": delta_encode(np.rint(track.lon * COORD_SCALE)),
+        "t": encode_times(track),
+        "f": track.filenames,
+        "z": [[zoom, delta_encode(kept)] for zoom, kept in levels],
+        "b": [[min_lat, min_lon], [max_lat, max_lon]],
+        "c": len(track) > MARKERS_MAX_POINTS,
+    }
+
+    thumbnails = thumbnails or {}
+    urls = [thumbnails.get(path, "") for path in track.paths]
+    present = [url for url in urls if url]
+    if present:
+        prefix = os.path.commonprefix(present)
+        data["ip"] = prefix
+        data["i"] = [url[len(prefix):] if url else "" for url in urls]
+    return data
+
+
+def write_file(path, content, gzip_copy=False):
+    """Write content atomically; gzip_copy also writes path + '.gz'"""
+    payload = content.encode("utf-8")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    # Never write through a stale tmp file: it could be a link to other content
+    remove_if_exists(tmp_path)
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    if gzip_copy:
+        # mtime=0: the same content always gives the same .gz
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(payload, compresslevel=9, mtime=0))
+        os.replace(tmp_path, path + ".gz")
+
+
+def shared_template(template_folder=DEFAULT_TEMPLATE_FOLDER, gzip_copy=False):
+    """Path of the minified page, written once and shared by every trip"""
+    page = minify(PAGE_TEMPLATE)
+    digest = hashlib.sha256(page.encode("utf-8")).hexdigest()[:12]
+    path = os.path.join(template_folder, f"map_template_{digest}.html")
+    if not os.path.exists(path) or (gzip_copy and not os.path.exists(path + ".gz")):
+        ensure_output_folder(template_folder)
+        write_file(path, page, gzip_copy)
+    return path
+
+
+def link_template(template, destination):
+    """Link (or copy) the shared page to destination, unless it already is that page"""
+    if os.path.exists(destination) and os.path.samefile(template, destination):
+        return
+    # The template is never modified in place (write_file replaces it)
+    place_in_store(template, destination, link_mode="hardlink")
+
+
+def data_path_for(output_path):
+    return os.path.splitext(output_path)[0] + DATA_SUFFIX
+
+
+def generate_compact_map(photo_points, output_path, thumbnails=None, gzip_output=False,
+                         simplify_tolerance_m=DEFAULT_SIMPLIFY_TOLERANCE_M,
+                         zoom_levels="auto", template_folder=DEFAULT_TEMPLATE_FOLDER):
+    """
+    Compact alternative to generate_itinerary_map: a static, minified page
+    (linked from a shared template) plus a packed data sidecar the page
+    loads once the map is shown. The sidecar is a script rather than JSON
+    so the page also works when opened from disk (file://).
+    gzip_output: also write .gz copies, for servers serving precompressed
+    files (e.g. nginx gzip_static); browsers opening the files from disk
+    use the uncompressed ones.
+    Same arguments and return value as generate_itinerary_map.
+    """
+    if len(photo_points) == 0:
+        print("Aucune donnée GPS trouvée. Impossible de générer la carte.")
+        return None
+
+    track = as_track(photo_points)
+    data = pack_track(track, thumbnails, simplify_tolerance_m, zoom_levels)
+
+    ensure_output_folder(os.path.dirname(output_path) or ".")
+    packed = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    write_file(data_path_for(output_path), f"localyTrack({packed});", gzip_output)
+
+    # The page usually already is a link to the template (the provisional
+    # maps of a run, or a rerun): link_template then leaves it alone
+    template = shared_template(template_folder, gzip_output)
+    link_template(template, output_path)
+    if gzip_output:
+        link_template(template + ".gz", output_path + ".gz")
+
+    print(f"✅ Carte compacte générée avec succès : {output_path}")
+    print(f"📍 {len(track)} points tracés")
+    return output_path
@@ -0,0 +1,219 @@
+import struct
+
+# Tags read from IFD0 / Exif IFD (same names as PIL.ExifTags.TAGS)
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+
+# IFD0 orientation and IFD1 (thumbnail) JPEG location
+TAG_ORIENTATION = 0x0112
+TAG_THUMBNAIL_OFFSET = 0x0201
+TAG_THUMBNAIL_LENGTH = 0x0202
+
+DATETIME_TAGS = {
+    TAG_DATETIME: "DateTime",
+    TAG_DATETIME_ORIGINAL: "DateTimeOriginal",
+    TAG_DATETIME_DIGITIZED: "DateTimeDigitized",
+}
+
+# TIFF field type -> size in bytes of one value
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+# Markers without a length field
+STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+
+def lire_segment_app1(chemin_image):
+    """
+    Return the TIFF block of the JPEG APP1/Exif segment, or None.
+    Only the marker headers are read; image data is never touched.
+    Raises ValueError if the file is not a JPEG.
+    """
+    with open(chemin_image, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            raise ValueError(f"Pas un fichier JPEG : {chemin_image}")
+
+        while True:
+            octet = f.read(1)
+            if not octet:
+                return None
+            if octet != b"\xff":
+                continue
+
+            marker = f.read(1)
+            # Skip fill bytes
+            while marker == b"\xff":
+                marker = f.read(1)
+            if not marker:
+                return None
+
+            code = marker[0]
+            if code in STANDALONE_MARKERS:
+                continue
+            # Start of scan / end of image: no Exif before the image data
+            if code in (0xDA, 0xD9):
+                return None
+
+            longueur_brute = f.read(2)
+            if len(longueur_brute) < 2:
+                return None
+            longueur = struct.unpack(">H", longueur_brute)[0] - 2
+
+            if code == 0xE1:
+                segment = f.read(longueur)
+                if segment[:6] == b"Exif\x00\x00":
+                    return segment[6:]
+            else:
+                f.seek(longueur, 1)
+
+
+def lire_valeur(tiff, ordre, type_champ, nombre, champ_valeur):
+    """Decode one IFD entry into the same shapes Pillow returns"""
+    taille = TYPE_SIZES.get(type_champ)
+    if taille is None:
+        return None
+
+    total = taille * nombre
+    if total <= 4:
+        donnees = champ_valeur[:total]
+    else:
+        offset = struct.unpack(ordre + "I", champ_valeur)[0]
+        donnees = tiff[offset:offset + total]
+        if len(donnees) < total:
+            return None
+
+    if type_champ == 2:
+        return donnees.split(b"\x00", 1)[0].decode("latin-1")
+    if type_champ == 7:
+        return donnees
+
+    if type_champ in (5, 10):
+        fmt = "i" if type_champ == 10 else "I"
+        valeurs = struct.unpack(ordre + fmt * (2 * nombre), donnees)
+        valeurs = tuple(zip(valeurs[0::2], valeurs[1::2]))
+    else:
+        fmt = {1: "B", 3: "H", 4: "I", 9: "i"}[type_champ]
+        valeurs = struct.unpack(ordre + fmt * nombre, donnees)
+
+    return valeurs[0] if nombre == 1 else valeurs
+
+
+def lire_ifd(tiff, ordre, offset, tags=None):
+    """
+    Read the entries of one IFD.
+    If tags is given, only those tags are decoded.
+    """
+    entrees = {}
+    if offset + 2 > len(tiff):
+        return entrees
+
+    nombre_entrees = struct.unpack(ordre + "H", tiff[offset:offset + 2])[0]
+    debut = offset + 2
+    fin = min(debut + 12 * nombre_entrees, len(tiff) - 11)
+
+    for position in range(debut, fin, 12):
+        tag, type_champ, nombre = struct.unpack(ordre + "HHI", tiff[position:position + 8])
+        if tags is not None and tag not in tags:
+            continue
+        valeur = lire_valeur(tiff, ordre, type_champ, nombre, tiff[position + 8:position + 12])
+        if valeur is not None:
+            entrees[tag] = valeur
+
+    return entrees
+
+
+def entete_tiff(tiff):
+    """(byte order, IFD0 offset) of a TIFF block, or None if it is invalid"""
+    if not tiff or len(tiff) < 8:
+        return None
+
+    if tiff[:2] == b"II":
+        ordre = "<"
+    elif tiff[:2] == b"MM":
+        ordre = ">"
+    else:
+        return None
+
+    if struct.unpack(ordre + "H", tiff[2:4])[0] != 42:
+        return None
+    return ordre, struct.unpack(ordre + "I", tiff[4:8])[0]
+
+
+def offset_ifd_suivant(tiff, ordre, offset):
+    """Offset of the IFD following the one at offset (0 if none)"""
+    if offset + 2 > len(tiff):
+        return 0
+    nombre_entrees = struct.unpack(ordre + "H", tiff[offset:offset + 2])[0]
+    position = offset + 2 + 12 * nombre_entrees
+    if position + 4 > len(tiff):
+        return 0
+    return struct.unpack(ordre + "I", tiff[position:position + 4])[0]
+
+
+def lire_miniature_exif(chemin_image):
+    """
+    Return (jpeg_bytes, orientation) of the thumbnail embedded in IFD1,
+    or (None, orientation) if there is none. Only the APP1 segment is read.
+    Raises ValueError if the file is not a JPEG.
+    """
+    tiff = lire_segment_app1(chemin_image)
+    entete = entete_tiff(tiff)
+    if entete is None:
+        return None, 1
+    ordre, ifd0_offset = entete
+
+    ifd0 = lire_ifd(tiff, ordre, ifd0_offset, tags={TAG_ORIENTATION})
+    orientation = ifd0.get(TAG_ORIENTATION, 1)
+    if not isinstance(orientation, int):
+        orientation = 1
+
+    ifd1_offset = offset_ifd_suivant(tiff, ordre, ifd0_offset)
+    if not ifd1_offset:
+        return None, orientation
+
+    ifd1 = lire_ifd(tiff, ordre, ifd1_offset, tags={TAG_THUMBNAIL_OFFSET, TAG_THUMBNAIL_LENGTH})
+    offset = ifd1.get(TAG_THUMBNAIL_OFFSET)
+    longueur = ifd1.get(TAG_THUMBNAIL_LENGTH)
+    if not isinstance(offset, int) or not isinstance(longueur, int) or longueur <= 0:
+        return None, orientation
+
+    miniature = tiff[offset:offset + longueur]
+    if len(miniature) < longueur or miniature[:2] != b"\xff\xd8":
+        return None, orientation
+    return miniature, orientation
+
+
+def lire_exif_entete(chemin_image):
+    """
+    Read only the GPS IFD and DateTime tags from a JPEG header.
+    Returns a dict shaped like lire_exif(): tag names as keys and
+    'GPSInfo' as a dict of numeric GPS tags -> raw values, with
+    rationals as (numerator, denominator) tuples.
+    """
+    tiff = lire_segment_app1(chemin_image)
+    entete = entete_tiff(tiff)
+    if entete is None:
+        return {}
+
+    ordre, ifd0_offset = entete
+    ifd0 = lire_ifd(tiff, ordre, ifd0_offset,
+                    tags={TAG_DATETIME, TAG_EXIF_IFD, TAG_GPS_IFD})
+
+    exif = {}
+    if TAG_DATETIME in ifd0:
+        exif["DateTime"] = ifd0[TAG_DATETIME]
+
+    if isinstance(ifd0.get(TAG_EXIF_IFD), int):
+        sous_ifd = lire_ifd(tiff, ordre, ifd0[TAG_EXIF_IFD],
+                            tags={TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED})
+        for tag, valeur in sous_ifd.items():
+            exif[DATETIME_TAGS[tag]] = valeur
+
+    if isinstance(ifd0.get(TAG_GPS_IFD), int):
+        gps = lire_ifd(tiff, ordre, ifd0[TAG_GPS_IFD])
+        if gps:
+            exif["GPSInfo"] = gps
+
+    return exif
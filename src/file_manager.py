@@ -1,72 +1,302 @@
+import fnmatch
+import hashlib
+import json
 import os
 import shutil
-from datetime import datetime
+import threading
 
-def get_images_from_paths(file_paths):
+STORE_INDEX_NAME = ".store_index.json"
+
+# Only JPEG carries the EXIF block lire_exif reads (SOI marker + next marker)
+JPEG_SIGNATURES = (b"\xff\xd8\xff",)
+SIGNATURE_LENGTH = 4
+
+# ioctl request number for copy-on-write clones on Linux (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+def has_image_signature(file_path, signatures=JPEG_SIGNATURES):
+    """Check a file's first bytes against known image signatures"""
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(SIGNATURE_LENGTH)
+    except OSError:
+        return False
+    return any(head.startswith(signature) for signature in signatures)
+
+
+def matches_any(name, rel_path, patterns):
+    """True if the file name or its relative path matches one of the glob patterns"""
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel_path, p) for p in patterns)
+
+
+def walk_images(folder_path, recursive=True, max_depth=None, include=None, exclude=None,
+                signatures=JPEG_SIGNATURES, skip_hidden=True):
     """
-    Returns a list of valid image file paths from a list of files/folders.
-    Supports both individual files and folders.
+    Yield image paths found under folder_path, one at a time.
+    Uses os.scandir (directory types come from the listing, no extra stat)
+    and checks file signatures instead of extensions.
+    Files are yielded in directory listing order, not sorted, so memory
+    does not grow with the size of a folder (only sub-folder paths are
+    kept; they are visited in name order).
+    max_depth: 0 = only folder_path itself, None = unlimited.
+    include/exclude: glob patterns matched against the name or relative path;
+    exclude also prunes directories.
+    skip_hidden: skip files and folders whose name starts with "."
+    (.DS_Store, .thumbnails, ...).
+    Symlinked folders are followed, but every folder is visited once (a
+    link to a parent folder does not loop).
+    """
+    patterns = bool(include or exclude)
+    # (path, depth, path relative to folder_path + separator, for the patterns)
+    stack = [(folder_path, 0, "")]
+    visited = set()
+    while stack:
+        directory, depth, prefix = stack.pop()
+        try:
+            st = os.stat(directory)
+        except OSError as e:
+            print(f"Impossible de lire le dossier {directory}: {e}")
+            continue
+        if (st.st_dev, st.st_ino) in visited:
+            continue
+        visited.add((st.st_dev, st.st_ino))
+
+        subdirectories = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if skip_hidden and entry.name.startswith("."):
+                        continue
+                    rel_path = prefix + entry.name if patterns else None
+                    if exclude and matches_any(entry.name, rel_path, exclude):
+                        continue
+
+                    try:
+                        if entry.is_dir():
+                            if recursive and (max_depth is None or depth < max_depth):
+                                subdirectories.append((entry.path, depth + 1,
+                                                       rel_path + os.sep if patterns else ""))
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+
+                    if include and not matches_any(entry.name, rel_path, include):
+                        continue
+                    if has_image_signature(entry.path, signatures):
+                        yield entry.path
+        except OSError as e:
+            print(f"Impossible de lire le dossier {directory}: {e}")
+
+        # Reversed so that sub-folders are visited in name order
+        stack.extend(sorted(subdirectories, reverse=True))
+
+
+def iter_images_from_paths(file_paths, recursive=True, max_depth=None, include=None,
+                           exclude=None, signatures=JPEG_SIGNATURES, skip_hidden=True):
+    """
+    Yield valid image paths from a list of files/folders.
+    Folders are walked recursively (see walk_images).
     """
-    valid_extensions = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".JPG", ".JPEG", ".PNG")
-    images = []
-    
     for path in file_paths:
         if os.path.isfile(path):
-            # It's a file
-            if path.lower().endswith(valid_extensions):
-                images.append(path)
+            if has_image_signature(path, signatures):
+                yield path
         elif os.path.isdir(path):
-            # It's a folder - get all images from it
-            for filename in os.listdir(path):
-                if filename.lower().endswith(valid_extensions):
-                    full_path = os.path.join(path, filename)
-                    images.append(full_path)
-    
-    return images
+            yield from walk_images(path, recursive, max_depth, include, exclude, signatures,
+                                   skip_hidden)
+
+
+def get_images_from_paths(file_paths, **options):
+    """
+    Returns a list of valid image file paths from a list of files/folders.
+    Supports both individual files and (nested) folders.
+    """
+    return list(iter_images_from_paths(file_paths, **options))
 
 
-def get_images_from_folder(folder_path):
+def get_images_from_folder(folder_path, **options):
     """
-    Returns a list of valid image file paths (JPG/JPEG only)
-    from the selected folder.
+    Returns a list of valid image file paths (JPEG only)
+    from the selected folder and its sub-folders.
     """
     if not os.path.exists(folder_path):
         raise FileNotFoundError(f"Le dossier n'existe pas : {folder_path}")
 
-    valid_extensions = (".jpg", ".jpeg")
-    images = []
+    return list(walk_images(folder_path, **options))
 
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(valid_extensions):
-            full_path = os.path.join(folder_path, filename)
-            images.append(full_path)
 
-    return images
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
-def copy_images_to_data(image_paths, data_folder="data/images"):
+def load_store_index(data_folder):
+    """Load the (source path -> size, mtime, hash) index of the image store"""
+    index_path = os.path.join(data_folder, STORE_INDEX_NAME)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_store_index(data_folder, index):
+    """Atomically write the image store index"""
+    index_path = os.path.join(data_folder, STORE_INDEX_NAME)
+    # Per writer: batch processes may save the same index concurrently
+    tmp_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+
+def reflink_file(source, destination):
     """
-    Copies uploaded images to the data/images folder.
-    Returns list of new paths in data folder.
+    Copy-on-write clone (Linux FICLONE). Raises OSError if unsupported.
+    destination must not exist: it is created exclusively, so an existing
+    file (possibly a hardlink to other content) is never truncated.
+    """
+    import fcntl
+    fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    with open(source, "rb") as src, os.fdopen(fd, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def place_in_store(source, destination, link_mode="auto"):
+    """
+    Materialize source at destination using the cheapest method available:
+    "auto" tries a reflink, then a full copy. Both give the store its own
+    data, so editing the original later never changes the stored content.
+    "hardlink" (opt-in) shares the original's inode: only for sources that
+    are never modified in place (e.g. the shared map template).
+    Returns the method used, or "existing" when destination already is
+    source (same file).
+    """
+    try:
+        if os.path.samefile(source, destination):
+            return "existing"
+    except OSError:
+        pass
+
+    tmp_path = f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp"
+    methods = {
+        "auto": ("reflink", "copy"),
+        "reflink": ("reflink", "copy"),
+        "hardlink": ("hardlink", "copy"),
+        "copy": ("copy",),
+    }[link_mode]
+
+    for method in methods:
+        # A tmp file left by an interrupted run may be a link to other content:
+        # unlink it rather than writing through it
+        remove_if_exists(tmp_path)
+        try:
+            if method == "reflink":
+                reflink_file(source, tmp_path)
+            elif method == "hardlink":
+                os.link(source, tmp_path)
+            else:
+                shutil.copy2(source, tmp_path)
+            os.replace(tmp_path, destination)
+            return method
+        except (OSError, ImportError):
+            remove_if_exists(tmp_path)
+            if method == "copy":
+                raise
+
+
+def copy_images_to_data(image_paths, data_folder="data/images", link_mode="auto",
+                        cancel_token=None):
+    """
+    Stores uploaded images in the content-addressed data/images folder.
+    Each file is stored once as <sha256><ext>; identical content maps to
+    the same path, and unchanged sources are not even re-read.
+    Returns list of store paths, in the same order as image_paths.
+    cancel_token: optional jobs.CancelToken, checked before each file.
     """
     ensure_output_folder(data_folder)
-    
-    copied_paths = []
-    for img_path in image_paths:
-        filename = os.path.basename(img_path)
-        destination = os.path.join(data_folder, filename)
-        
-        # Avoid overwriting - add timestamp if file exists
-        if os.path.exists(destination):
-            name, ext = os.path.splitext(filename)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{name}_{timestamp}{ext}"
-            destination = os.path.join(data_folder, filename)
-        
-        shutil.copy2(img_path, destination)
-        copied_paths.append(destination)
-    
-    return copied_paths
+    index = load_store_index(data_folder)
+    index_changed = False
+
+    stored_paths = []
+    try:
+        for img_path in image_paths:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
+            source_key = os.path.abspath(img_path)
+            st = os.stat(img_path)
+            ext = os.path.splitext(img_path)[1].lower()
+
+            entry = index.get(source_key)
+            if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                content_hash = entry[2]
+            else:
+                content_hash = hash_file(img_path)
+                index[source_key] = [st.st_size, st.st_mtime_ns, content_hash]
+                index_changed = True
+
+            destination = os.path.join(data_folder, f"{content_hash}{ext}")
+            if not os.path.exists(destination):
+                place_in_store(img_path, destination, link_mode)
+
+            stored_paths.append(destination)
+    finally:
+        # Keep the hashes computed so far, even when cancelled
+        if index_changed:
+            save_store_index(data_folder, index)
+
+    return stored_paths
+
+
+def lower_current_thread_priority():
+    """
+    Lower the CPU (and, with CFQ/BFQ, I/O) priority of the calling thread.
+    Best effort: only effective on Linux, ignored elsewhere.
+    """
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+def archive_images_in_background(image_paths, data_folder="data/images", link_mode="auto",
+                                 on_done=None):
+    """
+    Archive images into the data folder from a low-priority daemon thread.
+    on_done(stored_paths, error) is called from that thread when finished.
+    Returns the started thread.
+    """
+    image_paths = list(image_paths)
+
+    def archive():
+        lower_current_thread_priority()
+        try:
+            stored_paths = copy_images_to_data(image_paths, data_folder, link_mode)
+        except Exception as e:
+            print(f"Erreur lors de l'archivage des images: {e}")
+            if on_done:
+                on_done(None, e)
+            return
+        if on_done:
+            on_done(stored_paths, None)
+
+    thread = threading.Thread(target=archive, daemon=True)
+    thread.start()
+    return thread
 
 
 def validate_image_count(images_list, min_required=3):
@@ -1,3 +1,8 @@
+from itertools import chain
+
+import numpy as np
+
+
 def to_float(x):
     try:
         return float(x[0]) / float(x[1])
@@ -26,3 +31,123 @@ def convertir_gps(gps_brut):
 
     except Exception:
         return None
+
+
+# --- Batch (vectorized) API -------------------------------------------------
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def rationnels_vers_tableau(dms_list):
+    """
+    Convert a list of DMS triples into an (n, 3) float array.
+    Each component may be a (num, den) tuple or a number; malformed
+    rows and zero denominators become NaN.
+    """
+    n = len(dms_list)
+
+    # Fast path: every row is three (num, den) rationals (header-only reader)
+    try:
+        plats = np.fromiter(chain.from_iterable(chain.from_iterable(dms_list)), dtype=np.float64)
+    except (TypeError, ValueError):
+        plats = None
+    if plats is not None and plats.size == n * 6:
+        rationnels = plats.reshape(n, 3, 2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(rationnels[:, :, 1] != 0,
+                            rationnels[:, :, 0] / rationnels[:, :, 1], np.nan)
+
+    nums = np.full((n, 3), np.nan)
+    dens = np.ones((n, 3))
+
+    for i, dms in enumerate(dms_list):
+        try:
+            for j in range(3):
+                composante = dms[j]
+                if isinstance(composante, tuple):
+                    nums[i, j], dens[i, j] = composante
+                else:
+                    nums[i, j] = float(composante)
+        except (TypeError, IndexError, ValueError):
+            nums[i] = np.nan
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        valeurs = np.where(dens != 0, nums / dens, np.nan)
+    return valeurs
+
+
+def en_degres_lot(dms_array):
+    """Convert an (n, 3) DMS array to decimal degrees"""
+    return dms_array[:, 0] + dms_array[:, 1] / 60 + dms_array[:, 2] / 3600
+
+
+def gps_brut_complet(gps_brut):
+    return isinstance(gps_brut, dict) and all(
+        cle in gps_brut for cle in ("lat", "lat_ref", "lon", "lon_ref"))
+
+
+def convertir_gps_lot(gps_bruts):
+    """
+    Batch version of convertir_gps.
+    Takes a list of gps_brut dicts (or None) and returns (lat, lon) float64
+    arrays. Entries convertir_gps would reject (missing keys, malformed or
+    zero-denominator rationals) are NaN in both arrays, never in just one.
+    """
+    vides = ((np.nan,) * 3)
+    complets = [gps_brut_complet(g) for g in gps_bruts]
+    lats = [g["lat"] if ok else vides for g, ok in zip(gps_bruts, complets)]
+    lons = [g["lon"] if ok else vides for g, ok in zip(gps_bruts, complets)]
+    lat_refs = np.array([g["lat_ref"] if ok else None for g, ok in zip(gps_bruts, complets)],
+                        dtype=object)
+    lon_refs = np.array([g["lon_ref"] if ok else None for g, ok in zip(gps_bruts, complets)],
+                        dtype=object)
+
+    lat = en_degres_lot(rationnels_vers_tableau(lats))
+    lon = en_degres_lot(rationnels_vers_tableau(lons))
+
+    lat = np.where(lat_refs == "N", lat, -lat).astype(np.float64)
+    lon = np.where(lon_refs == "E", lon, -lon).astype(np.float64)
+
+    invalides = ~(np.isfinite(lat) & np.isfinite(lon))
+    lat[invalides] = np.nan
+    lon[invalides] = np.nan
+    return lat, lon
+
+
+def coordonnees_lot(gps_bruts):
+    """convertir_gps_lot as a list of (lat, lon) tuples, None where invalid"""
+    lat, lon = convertir_gps_lot(gps_bruts)
+    valides = np.isfinite(lat)
+    return [(la, lo) if ok else None
+            for la, lo, ok in zip(lat.tolist(), lon.tolist(), valides.tolist())]
+
+
+def haversine_segments(lat, lon):
+    """Great-circle distance in meters between consecutive points (n - 1 values)"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    if lat.size < 2:
+        return np.zeros(0)
+
+    dlat = np.diff(lat)
+    dlon = np.diff(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distance_cumulee(lat, lon):
+    """Cumulative distance in meters along the track (starts at 0)"""
+    segments = haversine_segments(lat, lon)
+    return np.concatenate(([0.0], np.cumsum(segments)))
+
+
+def vitesses(lat, lon, timestamps):
+    """
+    Speed in m/s for each segment.
+    timestamps: epoch seconds (int or float array). Segments with a
+    non-positive time delta are NaN.
+    """
+    segments = haversine_segments(lat, lon)
+    dt = np.diff(np.asarray(timestamps, dtype=np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(dt > 0, segments / dt, np.nan)
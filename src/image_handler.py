@@ -1,10 +1,46 @@
-from PIL import Image, ExifTags
+from PIL import Image, ExifTags, UnidentifiedImageError
 from datetime import datetime
+from exif_reader import lire_exif_entete
+
+
+class ExifReadError(Exception):
+    """
+    The file could not be read (missing, unreadable, I/O error). Unlike an
+    empty EXIF dict, this says nothing about the photo itself: the result
+    must not be cached.
+    """
+
 
 def lire_exif(chemin_image):
-    """Read EXIF data from an image"""
+    """
+    Read EXIF data from an image.
+    JPEGs go through the header-only reader (GPS + DateTime tags only);
+    other formats fall back to Pillow.
+    Returns {} for files without (readable) EXIF; raises ExifReadError when
+    the file itself could not be read.
+    """
+    try:
+        return lire_exif_entete(chemin_image)
+    except ValueError:
+        pass
+    except OSError as e:
+        raise ExifReadError(f"Lecture impossible de {chemin_image}: {e}") from e
+    except Exception as e:
+        print(f"Erreur lors de la lecture EXIF de {chemin_image}: {e}")
+        return {}
+
+    return lire_exif_pillow(chemin_image)
+
+
+def lire_exif_pillow(chemin_image):
+    """Read EXIF data from an image with Pillow (all tags); see lire_exif for errors"""
     try:
         img = Image.open(chemin_image)
+    except UnidentifiedImageError:
+        return {}
+    except OSError as e:
+        raise ExifReadError(f"Lecture impossible de {chemin_image}: {e}") from e
+    try:
         exif = {}
         infos = img._getexif()
         if infos:
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from file_manager import has_image_signature
+from metadata_extractor import extraire_metadonnees_photo
+
+MAX_FILE_SIZE = 500 * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Progress states of an ingested file
+PENDING = "pending"
+INGESTING = "uploading"
+COMPLETED = "completed"
+FAILED = "error"
+CANCELLED = "removed"
+
+
+class IngestionCancelled(Exception):
+    pass
+
+
+class IngestionScheduler:
+    """
+    Ingest selected photos on one bounded worker pool.
+
+    Each file is validated (size, JPEG signature), read once to compute its
+    SHA-256 (progress is counted in bytes actually read) and has its GPS /
+    date metadata extracted into the MetadataCache, so the itinerary page
+    starts with a warm cache.
+    Workers never touch widgets: they update per-file progress under a lock
+    and the UI thread collects the changes with drain(), at its own pace.
+    """
+
+    def __init__(self, workers=None, cache=None, max_file_size=MAX_FILE_SIZE):
+        if workers is None:
+            workers = min(8, (os.cpu_count() or 1) + 2)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                           thread_name_prefix="ingestion")
+        self.cache = cache
+        self.max_file_size = max_file_size
+        self.lock = threading.Lock()
+        self.files = {}
+        self.changed = set()
+
+    def submit(self, path):
+        """Queue a file; returns immediately. Files already queued are ignored."""
+        with self.lock:
+            if path in self.files:
+                return False
+            entry = self.files[path] = {
+                "status": PENDING, "done": 0, "size": 0,
+                "sha256": None, "metadata": None, "error": None,
+            }
+            self.changed.add(path)
+        self.executor.submit(self._ingest, path, entry)
+        return True
+
+    def cancel(self, path):
+        """Stop (or skip) a file's ingestion and forget it"""
+        with self.lock:
+            entry = self.files.pop(path, None)
+            if entry is not None:
+                entry["status"] = CANCELLED
+            self.changed.discard(path)
+
+    def drain(self):
+        """{path: progress copy} for the files that changed since the last call"""
+        with self.lock:
+            changes = {path: dict(self.files[path]) for path in self.changed if path in self.files}
+            self.changed.clear()
+        return changes
+
+    def totals(self):
+        """(bytes done, bytes total, files completed, files total)"""
+        with self.lock:
+            entries = list(self.files.values())
+        return (sum(e["done"] for e in entries), sum(e["size"] for e in entries),
+                sum(1 for e in entries if e["status"] == COMPLETED), len(entries))
+
+    def shutdown(self):
+        """Cancel queued files; files being read stop at their next chunk"""
+        with self.lock:
+            for entry in self.files.values():
+                if entry["status"] in (PENDING, INGESTING):
+                    entry["status"] = CANCELLED
+            self.files.clear()
+            self.changed.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _update(self, path, entry, **fields):
+        with self.lock:
+            # A file removed (and possibly re-added) since this task started
+            if self.files.get(path) is not entry:
+                raise IngestionCancelled(path)
+            entry.update(fields)
+            self.changed.add(path)
+
+    def _ingest(self, path, entry):
+        try:
+            size = os.path.getsize(path)
+            self._update(path, entry, status=INGESTING, size=size)
+
+            if size > self.max_file_size:
+                raise ValueError(f"dépasse la limite de {self.max_file_size // (1024 * 1024)} Mo")
+            if not has_image_signature(path):
+                raise ValueError("format non pris en charge (JPEG uniquement)")
+
+            digest = hashlib.sha256()
+            done = 0
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    done += len(chunk)
+                    self._update(path, entry, done=done)
+
+            # The file was just read: its header is in the page cache
+            metadata = extraire_metadonnees_photo(path)
+            if self.cache is not None and not metadata["error"]:
+                self.cache.put_many([metadata])
+
+            self._update(path, entry, status=COMPLETED, done=size, sha256=digest.hexdigest(),
+                         metadata=metadata)
+        except IngestionCancelled:
+            pass
+        except Exception as e:
+            try:
+                self._update(path, entry, status=FAILED, done=entry["size"], error=str(e))
+            except IngestionCancelled:
+                pass
@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from track import PhotoTrack
+
+STATE_FILENAME = "itinerary_state.npz"
+STATE_VERSION = 1
+
+
+def state_path(output_dir):
+    return os.path.join(output_dir, STATE_FILENAME)
+
+
+def save_state(output_dir, track, images, counts):
+    """
+    Save an itinerary next to its map: the sorted track, every image
+    already read (with or without GPS) and the run counts, so photos can
+    later be appended without reading the earlier ones again.
+    """
+    path = state_path(output_dir)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    meta = {"version": STATE_VERSION, "counts": counts}
+    with open(tmp_path, "wb") as f:
+        np.savez(f, lat=track.lat, lon=track.lon, timestamps=track.timestamps,
+                 filenames=np.array(track.filenames, dtype=str),
+                 paths=np.array(track.paths, dtype=str),
+                 images=np.array(images, dtype=str),
+                 meta=np.array(json.dumps(meta)))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_state(output_dir):
+    """{"track", "images", "counts"} saved in output_dir, or None if there is none"""
+    try:
+        with np.load(state_path(output_dir), allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != STATE_VERSION:
+                return None
+            track = PhotoTrack(data["lat"], data["lon"], data["timestamps"],
+                               data["filenames"].tolist(), presorted=True,
+                               paths=data["paths"].tolist())
+            images = data["images"].tolist()
+    except (OSError, KeyError, ValueError):
+        return None
+    return {"track": track, "images": images, "counts": meta["counts"]}
+
+
+def merge_tracks(track, new_track):
+    """
+    Insert new_track's points into track, both sorted by time. Points
+    sharing a timestamp keep the earlier track's points first, as a full
+    run would (they were read first).
+    """
+    if len(new_track) == 0:
+        return track
+    positions = np.searchsorted(track.timestamps, new_track.timestamps, side="right")
+
+    def insert(values, new_values):
+        merged = []
+        start = 0
+        for position, value in zip(positions.tolist(), new_values):
+            merged.extend(values[start:position])
+            merged.append(value)
+            start = position
+        merged.extend(values[start:])
+        return merged
+
+    return PhotoTrack(np.insert(track.lat, positions, new_track.lat),
+                      np.insert(track.lon, positions, new_track.lon),
+                      np.insert(track.timestamps, positions, new_track.timestamps),
+                      insert(track.filenames, new_track.filenames), presorted=True,
+                      paths=insert(track.paths, new_track.paths))
+
+
+def merge_counts(counts, new_counts):
+    return {key: counts.get(key, 0) + new_counts.get(key, 0) for key in new_counts}
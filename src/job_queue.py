@@ -0,0 +1,236 @@
+import itertools
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from file_manager import archive_images_in_background
+from jobs import Job, DONE, FAILED, QUEUED, RUNNING
+from metadata_cache import MetadataCache
+from pipeline import run_itinerary, itinerary_summary, write_summary
+from tracing import Tracer
+
+DEFAULT_JOBS_FOLDER = "data/jobs"
+# Job folders (and finished jobs) kept once a new job is submitted
+DEFAULT_KEEP_JOBS = 10
+JOB_ID_PATTERN = re.compile(r"^\d{8}-\d{6}-\d{3,}$")
+# Folders of other sessions or processes are only pruned once left untouched this long
+FOREIGN_JOB_MIN_AGE_SECONDS = 24 * 3600
+DEFAULT_DATA_FOLDER = "data/images"
+
+# Shared by every queue of the process; other processes are told apart when
+# the job folder is created (see JobQueue.create_job_folder)
+JOB_COUNTER = itertools.count(1)
+
+
+class JobQueue:
+    """
+    Runs itinerary jobs, at most max_concurrent at a time.
+
+    Every job writes into its own folder (output_root/<job id>/:
+    route_map.html, map_preview.png, summary.json), so trips processed in
+    parallel never overwrite each other. Jobs share one MetadataCache and
+    split the CPU cores between them for EXIF extraction.
+    Usable from a script (root=None) or from the app, where job callbacks
+    are delivered on the Tk thread.
+    thumbnails: optional ThumbnailService used for the map popups.
+    keep_jobs: retention, applied on every submit: only the keep_jobs most
+    recent job folders under output_root and finished jobs are kept (see
+    prune); unfinished jobs are never pruned.
+    data_folder: image store of the "copy" ingestion mode and of archiving.
+    """
+
+    def __init__(self, max_concurrent=2, output_root=DEFAULT_JOBS_FOLDER, root=None, cache=None,
+                 thumbnails=None, keep_jobs=DEFAULT_KEEP_JOBS, data_folder=DEFAULT_DATA_FOLDER):
+        self.max_concurrent = max(1, max_concurrent)
+        self.output_root = output_root
+        self.keep_jobs = max(1, keep_jobs)
+        self.data_folder = data_folder
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent,
+                                           thread_name_prefix="itinerary-job")
+        self.owns_cache = cache is None
+        self.cache = cache
+        self.thumbnails = thumbnails
+        self.lock = threading.Lock()
+        self.jobs = {}
+        # Job folders this queue created
+        self.folders = set()
+
+    def new_job_id(self):
+        return f"{datetime.now():%Y%m%d-%H%M%S}-{next(JOB_COUNTER):03d}"
+
+    def create_job_folder(self):
+        """New job id whose folder this call created (never one another process uses)"""
+        os.makedirs(self.output_root, exist_ok=True)
+        while True:
+            job_id = self.new_job_id()
+            try:
+                os.mkdir(os.path.join(self.output_root, job_id))
+            except FileExistsError:
+                continue
+            with self.lock:
+                self.folders.add(job_id)
+            return job_id
+
+    def prune(self, keep=None):
+        """
+        Forget finished jobs and delete job folders beyond the keep most
+        recent ones (job ids sort by date). Only folders of this queue's
+        finished jobs, and folders of other sessions or processes left
+        untouched for FOREIGN_JOB_MIN_AGE_SECONDS, are deleted; folders not
+        named like a job id are left alone.
+        """
+        keep = self.keep_jobs if keep is None else keep
+        with self.lock:
+            active = {os.path.basename(job.output_dir) for job in self.jobs.values()
+                      if job.status in (QUEUED, RUNNING)}
+            for job_id in list(self.jobs)[:-keep or None]:
+                if self.jobs[job_id].status not in (QUEUED, RUNNING):
+                    del self.jobs[job_id]
+            own = set(self.folders)
+
+        try:
+            names = sorted(name for name in os.listdir(self.output_root) if JOB_ID_PATTERN.match(name))
+        except OSError:
+            return
+        now = time.time()
+        for name in names[:-keep or None]:
+            if name in active:
+                continue
+            path = os.path.join(self.output_root, name)
+            if name not in own:
+                try:
+                    if now - os.stat(path).st_mtime < FOREIGN_JOB_MIN_AGE_SECONDS:
+                        continue
+                except OSError:
+                    continue
+            shutil.rmtree(path, ignore_errors=True)
+            with self.lock:
+                self.folders.discard(name)
+
+    def submit(self, file_paths, ingestion_mode="reference", archive=False, offline=False,
+               tracer=None, on_status=None, on_preview=None, on_done=None, append_to=None):
+        """
+        Queue an itinerary job; returns the Job (job.id, job.output_dir).
+        append_to: id of an earlier job whose itinerary the photos are added
+        to (run_itinerary's append); the job then writes into that job's
+        folder.
+        on_status / on_preview are forwarded to run_itinerary; on_done(job)
+        is called once the job is done or failed (job.status, job.result,
+        job.error). Callbacks go through job.post, so none is called once
+        the job is cancelled.
+        """
+        if append_to:
+            job_id = self.new_job_id()
+            output_dir = os.path.join(self.output_root, append_to)
+        else:
+            job_id = self.create_job_folder()
+            output_dir = os.path.join(self.output_root, job_id)
+        workers = max(1, (os.cpu_count() or 1) // self.max_concurrent)
+        tracer = tracer or Tracer()
+
+        with self.lock:
+            if self.cache is None:
+                self.cache = MetadataCache()
+
+        def target(token):
+            with tracer.profiling():
+                result = run_itinerary(
+                    file_paths,
+                    output_dir=output_dir,
+                    ingestion_mode=ingestion_mode,
+                    data_folder=self.data_folder,
+                    cache=self.cache,
+                    tracer=tracer,
+                    workers=workers,
+                    offline=offline,
+                    on_status=(lambda text: job.post(lambda: on_status(text))) if on_status else None,
+                    on_preview=(lambda map_path, image: job.post(lambda: on_preview(map_path, image)))
+                    if on_preview else None,
+                    cancel_token=token,
+                    thumbnails=self.thumbnails,
+                    append=append_to is not None
+                )
+            summary = itinerary_summary(result)
+            summary["job"] = append_to or job_id
+            write_summary(summary, os.path.join(output_dir, "summary.json"))
+
+            # Deferred, low-priority archiving once the map is ready
+            if archive and ingestion_mode == "reference" and not token.cancelled:
+                archive_images_in_background(result["images"], self.data_folder)
+            return result
+
+        job = Job(self.root, target, name=f"itinerary-{job_id}")
+        job.id = job_id
+        job.output_dir = output_dir
+        if on_done:
+            job.done_callbacks.append(on_done)
+        with self.lock:
+            self.jobs[job_id] = job
+        # The queued job's folder is kept whatever its age
+        self.prune()
+        return job.start(self.executor)
+
+    def append(self, job_id, file_paths, **options):
+        """Add photos to job_id's itinerary: only the new photos are read (see submit)"""
+        return self.submit(file_paths, append_to=job_id, **options)
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        return job.status if job else None
+
+    def statuses(self):
+        """{job id: status} for every job submitted, oldest first"""
+        with self.lock:
+            return {job_id: job.status for job_id, job in self.jobs.items()}
+
+    def result(self, job_id, timeout=None):
+        """
+        Wait for a job and return its run_itinerary result.
+        Re-raises the job's error; returns None if it was cancelled or
+        timeout expired first.
+        """
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if not job.wait(timeout):
+            return None
+        if job.status == FAILED:
+            raise job.error
+        return job.result if job.status == DONE else None
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def active(self):
+        with self.lock:
+            return [job for job in self.jobs.values() if job.status in (QUEUED, RUNNING)]
+
+    def wait_all(self, timeout=None):
+        """Wait for every submitted job; returns False on timeout"""
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return all(job.wait(timeout) for job in jobs)
+
+    def shutdown(self, cancel=True, wait=True):
+        """
+        Stop the queue, cancelling unfinished jobs unless cancel=False.
+        With wait=True, returns once the running jobs reached their next
+        cancellation checkpoint (and closes the queue's metadata cache).
+        """
+        if cancel:
+            for job in self.active():
+                job.cancel()
+        self.executor.shutdown(wait=wait, cancel_futures=cancel)
+        if wait and self.owns_cache and self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,128 @@
+import threading
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work once it has been cancelled"""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation flag shared by a job and the code it runs.
+    Long loops call raise_if_cancelled() between units of work (a file, a
+    chunk of EXIF reads, a pipeline stage) so cancelling stops the work at
+    the next checkpoint, with files closed by their normal with-blocks.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled()
+
+    def wait(self, timeout):
+        """Sleep up to timeout seconds; returns True if cancelled meanwhile"""
+        return self._event.wait(timeout)
+
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job:
+    """
+    Background work, optionally bound to a Tk root.
+
+    target(token) runs in a daemon thread, or on an executor (see
+    job_queue.JobQueue). Its return value becomes job.result; an exception
+    is kept in job.error; done_callbacks get the job once it ended.
+    post() schedules UI callbacks on the Tk thread
+    that are dropped once the job is cancelled, so a page the user already
+    left never receives late updates. Without a root, callbacks run
+    directly in the calling thread.
+    """
+
+    def __init__(self, root, target, name=None):
+        self.root = root
+        self.target = target
+        self.name = name
+        self.token = CancelToken()
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.future = None
+        self.finished = threading.Event()
+        self.done_callbacks = []
+        self.thread = None
+
+    def start(self, executor=None):
+        if executor is not None:
+            self.future = executor.submit(self._run)
+        else:
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.token.raise_if_cancelled()
+            self.status = RUNNING
+            self.result = self.target(self.token)
+            self.status = DONE
+        except JobCancelled:
+            self.status = CANCELLED
+        except Exception as e:
+            self.error = e
+            self.status = FAILED
+        finally:
+            # Posted like any UI callback: skipped once cancelled
+            for callback in self.done_callbacks:
+                self.post(lambda callback=callback: callback(self))
+            self.finished.set()
+
+    def wait(self, timeout=None):
+        """Block until the job ends; returns False on timeout"""
+        return self.finished.wait(timeout)
+
+    def post(self, callback):
+        """Run callback on the Tk thread, unless the job is cancelled first"""
+        if self.token.cancelled:
+            return
+        if self.root is None:
+            callback()
+            return
+
+        def run():
+            if not self.token.cancelled:
+                callback()
+
+        try:
+            self.root.after(0, run)
+        except Exception:
+            # Tk is shutting down (root destroyed or main loop stopped)
+            pass
+
+    def cancel(self):
+        self.token.cancel()
+        # Not started yet: never runs
+        if self.future is not None and self.future.cancel():
+            self.status = CANCELLED
+            self.finished.set()
+
+    @property
+    def cancelled(self):
+        return self.token.cancelled
+
+    def is_running(self):
+        return self.status == RUNNING
@@ -1,45 +1,124 @@
-import customtkinter as ctk
+import time
+STARTUP_BEGIN = time.perf_counter()
+
+import argparse
 import sys
 import os
-from tkinterweb import HtmlFrame
+import threading
+
+import customtkinter as ctk
 
 # Add src directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from ui.welcome_page import WelcomeApp
-from ui.upload_page import PhotoUploadApp
-from ui.itinerary_page import ItineraryResultsApp
+
+IMPORTS_DONE = time.perf_counter()
+
+# Loaded in the background once the welcome page is painted (the pages, the
+# pipeline, numpy and Pillow, then folium and staticmap, which run_itinerary
+# only imports when it draws a map); the pages import them again on use,
+# which is free once warmed up.
+WARM_UP_MODULES = ("ui.upload_page", "ui.itinerary_page", "map_plotter", "staticmap")
+
+
+def warm_up_imports():
+    """Import the heavy modules off the UI thread"""
+    import importlib
+    for name in WARM_UP_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Préchargement de {name} impossible: {e}")
+
 
 class LocalyApp:
-    def __init__(self):
+    def __init__(self, measure_startup=False, startup_budget_ms=None):
+        self.measure_startup = measure_startup
+        self.startup_budget_ms = startup_budget_ms
+        self.exit_code = 0
+
         self.root = ctk.CTk()
         self.root.title("Localy")
         self.root.geometry("700x650")
-        
+
         # Configure appearance
         ctk.set_appearance_mode("light")
         ctk.set_default_color_theme("blue")
-        
+
+        # Itinerary jobs, shared by the result pages (each job has its own output folder)
+        self.job_queue = None
+        self.thumbnails = None
+
         # Start with welcome page
         self.show_welcome_page()
-        
+
+        # Runs once the first frame has been drawn
+        self.root.after_idle(self.on_first_paint)
+
+    def on_first_paint(self):
+        if self.measure_startup:
+            self.report_startup()
+            self.root.destroy()
+            return
+        threading.Thread(target=warm_up_imports, daemon=True).start()
+
+    def report_startup(self):
+        """Print cold start -> first painted welcome page timings"""
+        self.root.update()
+        painted = time.perf_counter()
+        total_ms = (painted - STARTUP_BEGIN) * 1000
+        print(f"Démarrage : {total_ms:.0f} ms "
+              f"(imports {(IMPORTS_DONE - STARTUP_BEGIN) * 1000:.0f} ms, "
+              f"fenêtre {(painted - IMPORTS_DONE) * 1000:.0f} ms)")
+        if self.startup_budget_ms is not None and total_ms > self.startup_budget_ms:
+            print(f"❌ Budget de démarrage dépassé ({self.startup_budget_ms:.0f} ms)")
+            self.exit_code = 1
+
+    def get_thumbnails(self):
+        """Thumbnail service shared by the upload list and the map popups"""
+        if self.thumbnails is None:
+            from thumbnails import ThumbnailService
+            self.thumbnails = ThumbnailService()
+        return self.thumbnails
+
     def show_welcome_page(self):
         """Display the welcome page"""
         WelcomeApp(self.root, on_start_callback=self.show_upload_page)
-    
+
     def show_upload_page(self):
         """Display the upload photos page"""
-        PhotoUploadApp(self.root, on_submit_callback=self.show_itinerary_page)
-    
+        from ui.upload_page import PhotoUploadApp
+        PhotoUploadApp(self.root, on_submit_callback=self.show_itinerary_page,
+                       thumbnails=self.get_thumbnails())
+
     def show_itinerary_page(self, file_paths):
         """Display the itinerary results page"""
-        ItineraryResultsApp(self.root, file_paths, on_back_callback=self.show_upload_page)
-    
+        from ui.itinerary_page import ItineraryResultsApp
+        if self.job_queue is None:
+            from job_queue import JobQueue
+            self.job_queue = JobQueue(max_concurrent=2, root=self.root,
+                                      thumbnails=self.get_thumbnails())
+        ItineraryResultsApp(self.root, file_paths, on_back_callback=self.show_upload_page,
+                            job_queue=self.job_queue)
+
     def run(self):
         """Start the application"""
         self.root.mainloop()
+        if self.job_queue is not None:
+            self.job_queue.shutdown()
+        if self.thumbnails is not None:
+            self.thumbnails.close()
+        return self.exit_code
 
 
 if __name__ == "__main__":
-    app = LocalyApp()
-    app.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Localy")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="print the time to the first painted welcome page, then quit")
+    parser.add_argument("--startup-budget", type=float, default=None, metavar="MS",
+                        help="with --measure-startup, exit with status 1 above this time")
+    args = parser.parse_args()
+
+    app = LocalyApp(measure_startup=args.measure_startup, startup_budget_ms=args.startup_budget)
+    sys.exit(app.run())
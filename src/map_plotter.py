@@ -1,5 +1,26 @@
 import folium
+import html
 import os
+import threading
+
+import numpy as np
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from jinja2 import Template
+
+from simple_renderer import DEFAULT_RENDERER, PREVIEW_TOLERANCE_PX
+from simplify import simplify_latlon, douglas_peucker, meters_per_pixel, project_local_meters
+from tiles import TilesUnavailable, create_static_map, default_tile_source
+from track import as_track
+
+# Route simplification defaults (HTML map and previews)
+DEFAULT_SIMPLIFY_TOLERANCE_M = 2.0
+DEFAULT_ZOOM_LEVELS = (6, 10, 14, 17)
+ZOOM_LEVELS_MIN_POINTS = 2000
+
+# Above this many points, markers are emitted as one clustered GeoJSON layer
+MARKERS_MAX_POINTS = 500
+
 
 def initialize_map(center_coordinates, zoom_start=14):
     """Initialize a Folium map centered at given coordinates"""
@@ -17,28 +38,194 @@ def add_colored_marker(map_object, coordinate, marker_color, tooltip_text="", po
     marker = folium.Marker(
         location=[lat, lon],
         icon=folium.Icon(color=marker_color, icon='info-sign'),
-        tooltip=tooltip_text
+        tooltip=tooltip_text,
+        popup=folium.Popup(popup_text, max_width=300) if popup_text else None
     )
-    
-    if popup_text:
-        marker = folium.Marker(
-            location=[lat, lon],
-            icon=folium.Icon(color=marker_color, icon='info-sign'),
-            tooltip=tooltip_text,
-            popup=folium.Popup(popup_text, max_width=300)
-        )
-    
     marker.add_to(map_object)
 
 
-def draw_route(map_object, coordinates_list):
-    """Draw a route line connecting the coordinates"""
-    folium.PolyLine(
+class ClusteredPhotoLayer(JSCSSMixin, MacroElement):
+    """
+    All photo points as one GeoJSON FeatureCollection in a client-side
+    marker cluster. Tooltips and popups are built on demand from the
+    feature properties instead of being rendered per marker.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var data = {{ this.data|tojson }};
+            var total = data.features.length;
+            function escapeHtml(text) {
+                return String(text).replace(/[&<>"']/g, function(c) {
+                    return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c];
+                });
+            }
+            function color(n) {
+                return n === 1 ? "#10b981" : (n === total ? "#ef4444" : "#3b82f6");
+            }
+            var points = L.geoJSON(data, {
+                pointToLayer: function(feature, latlng) {
+                    var n = feature.properties.n;
+                    return L.circleMarker(latlng, {
+                        radius: (n === 1 || n === total) ? 9 : 7,
+                        color: "white", weight: 2,
+                        fillColor: color(n), fillOpacity: 1
+                    });
+                },
+                onEachFeature: function(feature, layer) {
+                    var p = feature.properties;
+                    layer.bindTooltip(function() {
+                        var label = p.n === 1 ? "Départ" : (p.n === total ? "Arrivée" : "Point " + p.n);
+                        return label + ": " + escapeHtml(p.f);
+                    });
+                    layer.bindPopup(function() {
+                        return '<div style="font-family: Arial, sans-serif;"><b>Point ' + p.n +
+                            '</b><br>' +
+                            (p.i ? '<img src="' + escapeHtml(p.i) + '" style="max-width: 160px; display: block;"><br>' : '') +
+                            '<small>' + escapeHtml(p.f) + '</small><br>' +
+                            (p.t ? '<small>📅 ' + escapeHtml(p.t) + '</small>' : '') + '</div>';
+                    }, {maxWidth: 300});
+                }
+            });
+            var cluster = L.markerClusterGroup({chunkedLoading: true});
+            cluster.addLayer(points);
+            {{ this._parent.get_name() }}.addLayer(cluster);
+        })();
+        {% endmacro %}
+    """)
+
+    default_js = [
+        ("markerclusterjs",
+         "https://cdnjs.cloudflare.com/ajax/libs/leaflet.markercluster/1.1.0/leaflet.markercluster.js"),
+    ]
+    default_css = [
+        ("markerclustercss",
+         "https://cdnjs.cloudflare.com/ajax/libs/leaflet.markercluster/1.1.0/MarkerCluster.css"),
+        ("markerclusterdefaultcss",
+         "https://cdnjs.cloudflare.com/ajax/libs/leaflet.markercluster/1.1.0/MarkerCluster.Default.css"),
+    ]
+
+    def __init__(self, track, thumbnails=None):
+        super().__init__()
+        self._name = "ClusteredPhotoLayer"
+        self.data = track_to_feature_collection(track, thumbnails)
+
+
+def track_to_feature_collection(track, thumbnails=None):
+    """
+    GeoJSON FeatureCollection of the track's points.
+    Properties are kept short: n (1-based number), f (filename), t (date),
+    and i (thumbnail URL) when thumbnails maps the photo's path to one.
+    """
+    thumbnails = thumbnails or {}
+    features = []
+    for i, (lat, lon) in enumerate(zip(track.lat.tolist(), track.lon.tolist())):
+        dt = track.datetime_at(i)
+        properties = {
+            "n": i + 1,
+            "f": track.filenames[i],
+            "t": dt.strftime("%d/%m/%Y %H:%M") if dt else ""
+        }
+        thumbnail = thumbnails.get(track.paths[i])
+        if thumbnail:
+            properties["i"] = thumbnail
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(lon, 7), round(lat, 7)]},
+            "properties": properties
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+class ZoomLevelSwitch(MacroElement):
+    """Show only the route layer matching the current zoom level"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var levels = [{% for zoom, layer in this.levels %}[{{ zoom }}, {{ layer.get_name() }}]{{ "," if not loop.last }}{% endfor %}];
+            function update() {
+                var zoom = map.getZoom(), chosen = levels[0][1];
+                levels.forEach(function(level) { if (zoom >= level[0]) { chosen = level[1]; } });
+                levels.forEach(function(level) {
+                    if (level[1] === chosen) { if (!map.hasLayer(level[1])) { map.addLayer(level[1]); } }
+                    else if (map.hasLayer(level[1])) { map.removeLayer(level[1]); }
+                });
+            }
+            map.on('zoomend', update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, levels):
+        super().__init__()
+        self._name = "ZoomLevelSwitch"
+        self.levels = levels
+
+
+def add_route_line(map_object, coordinates_list):
+    """Add one PolyLine with the route style"""
+    line = folium.PolyLine(
         coordinates_list,
         color='#173DED',
         weight=4,
         opacity=0.8
-    ).add_to(map_object)
+    )
+    line.add_to(map_object)
+    return line
+
+
+def route_levels(lats, lons, tolerance_m=None, zoom_levels=None, tolerance_px=1.5):
+    """
+    Indices of the route points kept at each zoom level: [(min zoom, kept)].
+    Without zoom_levels, one level (zoom 0) simplified to tolerance_m;
+    otherwise each level is simplified to tolerance_px at its zoom
+    (and never below tolerance_m).
+    """
+    if len(lats) < 3 or (tolerance_m is None and not zoom_levels):
+        return [(0, list(range(len(lats))))]
+    if not zoom_levels:
+        return [(0, simplify_latlon(lats, lons, tolerance_m))]
+
+    mid_lat = float(np.mean(lats))
+    levels = []
+    for zoom in sorted(zoom_levels):
+        tolerance = tolerance_px * meters_per_pixel(zoom, mid_lat)
+        if tolerance_m is not None:
+            tolerance = max(tolerance, tolerance_m)
+        levels.append((zoom, simplify_latlon(lats, lons, tolerance)))
+    return levels
+
+
+def draw_route(map_object, coordinates_list, tolerance_m=None, zoom_levels=None, tolerance_px=1.5):
+    """
+    Draw a route line connecting the coordinates.
+    tolerance_m: simplify the line (Douglas–Peucker) with this tolerance in meters.
+    zoom_levels: e.g. (6, 10, 14); draws one line per level, simplified to
+    tolerance_px at that zoom, and shows the one matching the current zoom.
+    Returns the number of vertices kept in the most detailed line.
+    """
+    total = len(coordinates_list)
+    if total < 3 or (tolerance_m is None and not zoom_levels):
+        add_route_line(map_object, coordinates_list)
+        return total
+
+    lats = np.array([c[0] for c in coordinates_list])
+    lons = np.array([c[1] for c in coordinates_list])
+    levels = route_levels(lats, lons, tolerance_m, zoom_levels, tolerance_px)
+
+    if not zoom_levels:
+        kept = levels[0][1]
+        add_route_line(map_object, [coordinates_list[i] for i in kept])
+        return len(kept)
+
+    lines = [(zoom, add_route_line(map_object, [coordinates_list[i] for i in kept]))
+             for zoom, kept in levels]
+    ZoomLevelSwitch(lines).add_to(map_object)
+    return len(levels[-1][1])
 
 
 def adjust_map_view(map_object, coordinates_list):
@@ -54,52 +241,28 @@ def save_map(map_object, output_path):
     map_object.save(output_path)
 
 
-def generate_itinerary_map(photo_points, output_path="data/output/route_map.html"):
+def add_numbered_markers(route_map, track, coordinates, thumbnails=None):
     """
-    Generate an itinerary map from photo points.
-    Photo points should have: filename, latitude, longitude, timestamp (optional)
+    Add one colored folium.Marker with an HTML popup per photo.
+    thumbnails: optional {photo path: thumbnail URL} shown in the popups.
     """
-    
-    if len(photo_points) == 0:
-        print("Aucune donnée GPS trouvée. Impossible de générer la carte.")
-        return None
-
-    # 1. Sort by timestamp if available
-    photo_points_sorted = sorted(
-        photo_points, 
-        key=lambda x: x.get("timestamp", "") or ""
-    )
-
-    # 2. Extract coordinates
-    coordinates = [
-        [p["latitude"], p["longitude"]]
-        for p in photo_points_sorted
-    ]
-
-    # 3. Initialize map centered on first point
-    first_point = coordinates[0]
-    route_map = initialize_map(first_point)
-
-    # 4. Add numbered markers with colors
-    for i, point in enumerate(photo_points_sorted):
-        coord = (point["latitude"], point["longitude"])
-        filename = point.get("filename", "")
-        timestamp = point.get("timestamp", "")
+    thumbnails = thumbnails or {}
+    count = len(track)
+    for i, coord in enumerate(coordinates):
+        filename = track.filenames[i]
+        dt = track.datetime_at(i)
         
         # Format timestamp for display
-        time_display = ""
-        if timestamp:
-            try:
-                from datetime import datetime
-                dt = datetime.fromisoformat(timestamp)
-                time_display = dt.strftime("%d/%m/%Y %H:%M")
-            except:
-                time_display = timestamp
+        time_display = dt.strftime("%d/%m/%Y %H:%M") if dt else ""
+        thumbnail = thumbnails.get(track.paths[i])
+        thumbnail_html = (f'<img src="{html.escape(thumbnail)}" style="max-width: 160px; display: block;"><br>'
+                          if thumbnail else '')
         
         # Create popup content
         popup_content = f"""
         <div style="font-family: Arial, sans-serif;">
             <b>Point {i+1}</b><br>
+            {thumbnail_html}
             <small>{filename}</small><br>
             {f'<small>📅 {time_display}</small>' if time_display else ''}
         </div>
@@ -114,7 +277,7 @@ def generate_itinerary_map(photo_points, output_path="data/output/route_map.html
             )
 
         # Last point = red (end)
-        elif i == len(photo_points_sorted) - 1:
+        elif i == count - 1:
             add_colored_marker(
                 route_map, coord, "red", 
                 tooltip_text=f"Arrivée: {filename}",
@@ -129,8 +292,50 @@ def generate_itinerary_map(photo_points, output_path="data/output/route_map.html
                 popup_text=popup_content
             )
 
+
+def generate_itinerary_map(photo_points, output_path, simplify_tolerance_m=DEFAULT_SIMPLIFY_TOLERANCE_M,
+                           zoom_levels="auto", marker_mode="auto", thumbnails=None):
+    """
+    Generate an itinerary map from photo points.
+    photo_points: a PhotoTrack, or dicts with filename, latitude, longitude,
+    timestamp (optional)
+    simplify_tolerance_m / zoom_levels: see draw_route. "auto" uses
+    zoom-dependent lines only for tracks above ZOOM_LEVELS_MIN_POINTS.
+    marker_mode: "markers" (one folium.Marker per photo), "cluster" (one
+    GeoJSON layer with client-side clustering) or "auto" (cluster above
+    MARKERS_MAX_POINTS).
+    thumbnails: optional {photo path: thumbnail URL (relative to the map)}
+    shown in the marker popups (see PhotoTrack.paths).
+    """
+    
+    if len(photo_points) == 0:
+        print("Aucune donnée GPS trouvée. Impossible de générer la carte.")
+        return None
+
+    # 1. Sorted track (sorted once, shared with the other renderers)
+    track = as_track(photo_points)
+
+    # 2. Extract coordinates
+    coordinates = track.coordinates()
+
+    # 3. Initialize map centered on first point
+    first_point = coordinates[0]
+    route_map = initialize_map(first_point)
+
+    # 4. Add numbered markers with colors
+    count = len(track)
+    if marker_mode == "auto":
+        marker_mode = "cluster" if count > MARKERS_MAX_POINTS else "markers"
+
+    if marker_mode == "cluster":
+        ClusteredPhotoLayer(track, thumbnails).add_to(route_map)
+    else:
+        add_numbered_markers(route_map, track, coordinates, thumbnails)
+
     # 5. Draw the route line
-    draw_route(route_map, coordinates)
+    if zoom_levels == "auto":
+        zoom_levels = DEFAULT_ZOOM_LEVELS if count >= ZOOM_LEVELS_MIN_POINTS else None
+    draw_route(route_map, coordinates, simplify_tolerance_m, zoom_levels)
 
     # 6. Auto-fit zoom to show all points
     adjust_map_view(route_map, coordinates)
@@ -139,43 +344,63 @@ def generate_itinerary_map(photo_points, output_path="data/output/route_map.html
     save_map(route_map, output_path)
 
     print(f"✅ Carte générée avec succès : {output_path}")
-    print(f"📍 {len(photo_points_sorted)} points tracés")
+    print(f"📍 {count} points tracés")
     
     return output_path
 
 
-def generate_static_map_image(photo_points, output_path="data/output/map_preview.png"):
+def save_preview(image, output_path):
+    """Write a preview PNG atomically: a reader never sees a half-written file"""
+    directory = os.path.dirname(output_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    image.save(tmp_path, 'PNG')
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def render_static_map_image(photo_points, tile_source=None, offline=False):
     """
-    Generate a static PNG image preview of the map with real map tiles.
-    Uses staticmap library to fetch real OpenStreetMap tiles.
+    Render a static preview of the map with real map tiles, as a PIL image.
+    Uses staticmap library with OpenStreetMap tiles served through the
+    on-disk tile cache (see tiles.py).
+    tile_source: any tiles.TileSource (local directory, MBTiles, ...);
+    defaults to cached OSM tiles. offline=True never touches the network.
+    Falls back to render_simple_map_image when tiles are unavailable.
     """
+    owns_tile_source = tile_source is None
     try:
-        from staticmap import StaticMap, CircleMarker, Line
+        from staticmap import CircleMarker, Line
         
-        # Sort by timestamp
-        sorted_points = sorted(photo_points, key=lambda x: x.get("timestamp", "") or "")
+        track = as_track(photo_points)
         
-        if len(sorted_points) < 2:
+        if len(track) < 2:
             return None
         
+        if owns_tile_source:
+            tile_source = default_tile_source(offline=offline)
+        
         # Create static map (800x600)
-        m = StaticMap(800, 600, url_template='http://a.tile.openstreetmap.org/{z}/{x}/{y}.png')
+        m = create_static_map(800, 600, tile_source)
         
         # Prepare coordinates for the route line
-        line_coords = []
-        
-        # Add markers and collect coordinates
-        for i, point in enumerate(sorted_points):
-            lon = point["longitude"]
-            lat = point["latitude"]
-            line_coords.append((lon, lat))
-            
+        line_coords = list(zip(track.lon.tolist(), track.lat.tolist()))
+
+        # Simplified to about half a pixel of the 800px-wide preview
+        x, y = project_local_meters(track.lat, track.lon)
+        extent_m = max(float(np.ptp(x)), float(np.ptp(y)))
+        kept = douglas_peucker(x, y, PREVIEW_TOLERANCE_PX * extent_m / 800)
+        route_coords = [line_coords[i] for i in kept]
+        
+        # Add markers
+        for i, (lon, lat) in enumerate(line_coords):
             # Add colored markers
             if i == 0:
                 # Start point - green
                 marker = CircleMarker((lon, lat), '#10b981', 18)
                 m.add_marker(marker)
-            elif i == len(sorted_points) - 1:
+            elif i == len(line_coords) - 1:
                 # End point - red
                 marker = CircleMarker((lon, lat), '#ef4444', 18)
                 m.add_marker(marker)
@@ -185,21 +410,15 @@ def generate_static_map_image(photo_points, output_path="data/output/map_preview
                 m.add_marker(marker)
         
         # Add route line
-        line = Line(line_coords, '#173DED', 4)
+        line = Line(route_coords, '#173DED', 4)
         m.add_line(line)
         
-        # Render and save
-        image = m.render()
-        
-        # Save image
-        directory = os.path.dirname(output_path)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-        
-        image.save(output_path)
-        print(f"✅ Aperçu de carte généré avec vraie carte : {output_path}")
-        
-        return output_path
+        return m.render()
+
+    except TilesUnavailable as e:
+        # Offline cache miss or tile server unreachable: expected, no traceback
+        print(f"ℹ️  Fond de carte indisponible ({e}), aperçu simplifié")
+        return render_simple_map_image(photo_points)
         
     except Exception as e:
         print(f"⚠️  Erreur lors de la génération de l'aperçu avec staticmap: {e}")
@@ -208,145 +427,54 @@ def generate_static_map_image(photo_points, output_path="data/output/map_preview
         traceback.print_exc()
         
         # Fallback to simple drawing if staticmap fails
-        return generate_simple_map_image(photo_points, output_path)
+        return render_simple_map_image(photo_points)
+    
+    finally:
+        if owns_tile_source and tile_source is not None:
+            tile_source.close()
+
+
+def generate_static_map_image(photo_points, output_path, tile_source=None, offline=False):
+    """
+    Generate a static PNG image preview of the map with real map tiles
+    (see render_static_map_image). Returns output_path, or None.
+    """
+    image = render_static_map_image(photo_points, tile_source, offline)
+    if image is None:
+        return None
+    save_preview(image, output_path)
+    print(f"✅ Aperçu de carte généré : {output_path}")
+    return output_path
 
 
-def generate_simple_map_image(photo_points, output_path="data/output/map_preview.png"):
+def render_simple_map_image(photo_points, renderer=None):
     """
-    Fallback: Generate a simple map image without real tiles.
+    Fallback: Render a simple map image without real tiles, as a PIL image.
+    renderer: a SimpleMapRenderer (defaults to the shared 800x600 one).
     """
     try:
-        from PIL import Image, ImageDraw, ImageFont
-        import math
-        
-        # Image dimensions
-        width, height = 800, 600
-        
-        # Create white background
-        img = Image.new('RGB', (width, height), '#f3f4f6')
-        draw = ImageDraw.Draw(img)
+        track = as_track(photo_points)
         
-        # Sort by timestamp
-        sorted_points = sorted(photo_points, key=lambda x: x.get("timestamp", "") or "")
-        
-        if len(sorted_points) < 2:
+        if len(track) < 2:
             return None
         
-        # Get coordinate bounds
-        lats = [p["latitude"] for p in sorted_points]
-        lons = [p["longitude"] for p in sorted_points]
-        
-        min_lat, max_lat = min(lats), max(lats)
-        min_lon, max_lon = min(lons), max(lons)
-        
-        # Add padding (10%)
-        lat_range = max_lat - min_lat or 0.01
-        lon_range = max_lon - min_lon or 0.01
-        
-        min_lat -= lat_range * 0.1
-        max_lat += lat_range * 0.1
-        min_lon -= lon_range * 0.1
-        max_lon += lon_range * 0.1
-        
-        # Map coordinates to image pixels
-        padding = 60
-        drawable_width = width - 2 * padding
-        drawable_height = height - 2 * padding
-        
-        def lat_lon_to_xy(lat, lon):
-            x = padding + ((lon - min_lon) / (max_lon - min_lon)) * drawable_width
-            y = padding + ((max_lat - lat) / (max_lat - min_lat)) * drawable_height
-            return int(x), int(y)
-        
-        # Convert all points
-        pixel_points = [lat_lon_to_xy(p["latitude"], p["longitude"]) for p in sorted_points]
-        
-        # Draw route line
-        if len(pixel_points) > 1:
-            draw.line(pixel_points, fill='#173DED', width=4)
-        
-        # Draw markers with glow effect
-        for i, (x, y) in enumerate(pixel_points):
-            # Marker circle with shadow/glow
-            radius = 14
-            
-            # Draw glow (larger semi-transparent circle)
-            glow_radius = radius + 4
-            
-            if i == 0:
-                # Start point - green with glow
-                draw.ellipse([x-glow_radius, y-glow_radius, x+glow_radius, y+glow_radius], 
-                           fill='#6ee7b7', outline=None)
-                draw.ellipse([x-radius, y-radius, x+radius, y+radius], 
-                           fill='#10b981', outline='white', width=3)
-            elif i == len(pixel_points) - 1:
-                # End point - red with glow
-                draw.ellipse([x-glow_radius, y-glow_radius, x+glow_radius, y+glow_radius], 
-                           fill='#fca5a5', outline=None)
-                draw.ellipse([x-radius, y-radius, x+radius, y+radius], 
-                           fill='#ef4444', outline='white', width=3)
-            else:
-                # Middle points - blue with glow
-                draw.ellipse([x-glow_radius, y-glow_radius, x+glow_radius, y+glow_radius], 
-                           fill='#93c5fd', outline=None)
-                draw.ellipse([x-radius, y-radius, x+radius, y+radius], 
-                           fill='#3b82f6', outline='white', width=3)
-            
-            # Point number
-            try:
-                font = ImageFont.truetype("arial.ttf", 14)
-            except:
-                font = ImageFont.load_default()
-            
-            text = str(i + 1)
-            bbox = draw.textbbox((0, 0), text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            draw.text((x - text_width//2, y - text_height//2), text, 
-                     fill='white', font=font)
-        
-        # Add title
-        try:
-            title_font = ImageFont.truetype("arial.ttf", 24)
-        except:
-            title_font = ImageFont.load_default()
-        
-        title = "Votre Itinéraire"
-        draw.text((20, 20), title, fill='#1f2937', font=title_font)
-        
-        # Add legend
-        legend_y = height - 40
-        legend_items = [
-            ('#10b981', 'Départ'),
-            ('#3b82f6', 'Points'),
-            ('#ef4444', 'Arrivée')
-        ]
-        
-        legend_x = 20
-        for color, label in legend_items:
-            # Color circle
-            draw.ellipse([legend_x, legend_y, legend_x+15, legend_y+15], 
-                        fill=color, outline='white', width=2)
-            # Label
-            try:
-                legend_font = ImageFont.truetype("arial.ttf", 12)
-            except:
-                legend_font = ImageFont.load_default()
-            draw.text((legend_x + 20, legend_y), label, fill='#6b7280', font=legend_font)
-            legend_x += 100
-        
-        # Save image
-        directory = os.path.dirname(output_path)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-        
-        img.save(output_path, 'PNG')
-        print(f"✅ Aperçu de carte généré : {output_path}")
-        
-        return output_path
+        return (renderer or DEFAULT_RENDERER).render(track)
         
     except Exception as e:
         print(f"⚠️  Erreur lors de la génération de l'aperçu: {e}")
         import traceback
         traceback.print_exc()
-        return None
\ No newline at end of file
+        return None
+
+
+def generate_simple_map_image(photo_points, output_path, renderer=None):
+    """
+    Fallback: Generate a simple map image without real tiles
+    (see render_simple_map_image). Returns output_path, or None.
+    """
+    image = render_simple_map_image(photo_points, renderer)
+    if image is None:
+        return None
+    save_preview(image, output_path)
+    print(f"✅ Aperçu de carte généré : {output_path}")
+    return output_path
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from file_manager import ensure_output_folder
+
+DEFAULT_CACHE_PATH = "data/cache/metadata.sqlite"
+# Batch runs share the cache between processes: wait for locks instead of failing
+BUSY_TIMEOUT_SECONDS = 30
+
+# Bytes hashed in content-check mode (EXIF lives in the first 64 KB)
+HASH_HEAD_SIZE = 64 * 1024
+
+
+def hash_entete(chemin_image, taille=HASH_HEAD_SIZE):
+    """Hash the first bytes of a file (cheap content check)"""
+    with open(chemin_image, "rb") as f:
+        return hashlib.sha1(f.read(taille)).hexdigest()
+
+
+class MetadataCache:
+    """
+    On-disk cache of extracted GPS/timestamp metadata.
+    Entries are keyed by (path, size, mtime); with verify_content=True a
+    hash of the file header must also match.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, max_entries=200000, verify_content=False):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.verify_content = verify_content
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            ensure_output_folder(directory)
+
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS metadata (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT,
+                latitude REAL,
+                longitude REAL,
+                timestamp TEXT,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_metadata_access ON metadata(last_access)")
+        self.conn.commit()
+
+    def file_key(self, chemin_image):
+        """Return (size, mtime_ns, content_hash) for a file"""
+        st = os.stat(chemin_image)
+        content_hash = hash_entete(chemin_image) if self.verify_content else None
+        return st.st_size, st.st_mtime_ns, content_hash
+
+    def get_many(self, chemins):
+        """
+        Look up many paths at once.
+        Returns {path: result} for valid entries only, results shaped like
+        metadata_extractor.extraire_metadonnees_photo().
+        """
+        trouves = {}
+        chemins = list(chemins)
+        lignes = {}
+
+        with self.lock:
+            # SQLite limits the number of bound parameters per query
+            for i in range(0, len(chemins), 500):
+                lot = chemins[i:i + 500]
+                marqueurs = ",".join("?" * len(lot))
+                for ligne in self.conn.execute(
+                        f"SELECT path, size, mtime_ns, content_hash, latitude, longitude, timestamp "
+                        f"FROM metadata WHERE path IN ({marqueurs})", lot):
+                    lignes[ligne[0]] = ligne
+
+        for chemin, (path, size, mtime_ns, content_hash, lat, lon, timestamp) in lignes.items():
+            try:
+                st = os.stat(chemin)
+            except OSError:
+                continue
+            if st.st_size != size or st.st_mtime_ns != mtime_ns:
+                continue
+            if self.verify_content and content_hash != hash_entete(chemin):
+                continue
+
+            trouves[chemin] = {
+                "path": chemin,
+                "coords": (lat, lon) if lat is not None else None,
+                "timestamp": datetime.fromisoformat(timestamp) if timestamp else None,
+                "error": None
+            }
+
+        if trouves:
+            maintenant = time.time()
+            with self.lock:
+                self.conn.executemany(
+                    "UPDATE metadata SET last_access = ? WHERE path = ?",
+                    [(maintenant, chemin) for chemin in trouves])
+                self.conn.commit()
+
+        return trouves
+
+    def get(self, chemin_image):
+        """Look up a single path, or None if missing/stale"""
+        return self.get_many([chemin_image]).get(chemin_image)
+
+    def put_many(self, resultats):
+        """
+        Store extraction results. Entries with an error (the file could not
+        be read, see image_handler.ExifReadError) are skipped: only what was
+        actually read from the file is cached.
+        """
+        lignes = []
+        maintenant = time.time()
+        for resultat in resultats:
+            if resultat.get("error"):
+                continue
+            try:
+                size, mtime_ns, content_hash = self.file_key(resultat["path"])
+            except OSError:
+                continue
+            coords = resultat.get("coords")
+            timestamp = resultat.get("timestamp")
+            lignes.append((
+                resultat["path"], size, mtime_ns, content_hash,
+                coords[0] if coords else None,
+                coords[1] if coords else None,
+                timestamp.isoformat() if timestamp else None,
+                maintenant
+            ))
+
+        if not lignes:
+            return
+
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO metadata "
+                "(path, size, mtime_ns, content_hash, latitude, longitude, timestamp, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", lignes)
+            self.conn.commit()
+        self.enforce_size_cap()
+
+    def put(self, resultat):
+        """Store a single extraction result"""
+        self.put_many([resultat])
+
+    def invalidate(self, chemins):
+        """Remove the given paths from the cache"""
+        with self.lock:
+            self.conn.executemany("DELETE FROM metadata WHERE path = ?",
+                                  [(chemin,) for chemin in chemins])
+            self.conn.commit()
+
+    def clear(self):
+        """Remove every entry"""
+        with self.lock:
+            self.conn.execute("DELETE FROM metadata")
+            self.conn.commit()
+
+    def enforce_size_cap(self):
+        """Evict least recently used entries above max_entries"""
+        if not self.max_entries:
+            return
+        with self.lock:
+            nombre = self.conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+            excedent = nombre - self.max_entries
+            if excedent > 0:
+                self.conn.execute(
+                    "DELETE FROM metadata WHERE path IN "
+                    "(SELECT path FROM metadata ORDER BY last_access ASC LIMIT ?)",
+                    (excedent,))
+                self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,170 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from image_handler import lire_exif, extraire_gps_brut, extraire_timestamp
+from gps_utils import coordonnees_lot
+
+
+def lire_metadonnees_photo(chemin_image):
+    """
+    Read the raw GPS data and the timestamp of one image: (result, gps_brut).
+    Errors are caught and returned in the result instead of raised.
+    "seconds" is the time spent on this image (for the per-file outliers).
+    """
+    debut = time.perf_counter()
+    resultat = {"path": chemin_image, "coords": None, "timestamp": None, "error": None}
+    gps_brut = None
+    try:
+        exif = lire_exif(chemin_image)
+        gps_brut = extraire_gps_brut(exif)
+        resultat["timestamp"] = extraire_timestamp(exif)
+    except Exception as e:
+        resultat["error"] = str(e)
+    resultat["seconds"] = time.perf_counter() - debut
+    return resultat, gps_brut
+
+
+def extraire_lot(chemins):
+    """
+    Extract metadata for a chunk of images (one task in the pool).
+    The chunk's GPS coordinates are converted in one vectorized call.
+    """
+    lus = [lire_metadonnees_photo(chemin) for chemin in chemins]
+    coordonnees = coordonnees_lot([gps_brut for _, gps_brut in lus])
+    for (resultat, _), coords in zip(lus, coordonnees):
+        resultat["coords"] = coords
+    return [resultat for resultat, _ in lus]
+
+
+def extraire_metadonnees_photo(chemin_image):
+    """Extract GPS coordinates and timestamp from one image"""
+    return extraire_lot([chemin_image])[0]
+
+
+def creer_executor(backend, workers):
+    """Create the worker pool for the given backend"""
+    if backend == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    if backend == "thread":
+        return ThreadPoolExecutor(max_workers=workers)
+    raise ValueError(f"Backend inconnu : {backend}")
+
+
+def iter_metadonnees(chemins, workers=None, backend="thread", chunk_size=16, cache=None,
+                     cancel_token=None):
+    """
+    Stream metadata extraction over an iterable of paths.
+
+    Paths are consumed lazily and at most a few chunks per worker are in
+    flight. Yields lists of (index, result) pairs as chunks complete, where
+    index is the position of the path in the input.
+    cache: optional MetadataCache; hits skip extraction, misses are stored.
+    cancel_token: optional jobs.CancelToken, checked between chunks.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, workers)
+    max_en_vol = workers * 2
+
+    iterateur = enumerate(chemins)
+
+    def prochain_lot():
+        lot = []
+        for paire in iterateur:
+            lot.append(paire)
+            if len(lot) >= chunk_size:
+                break
+        return lot
+
+    with creer_executor(backend, workers) as executor:
+        en_vol = {}
+        epuise = False
+
+        try:
+            while True:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+
+                while not epuise and len(en_vol) < max_en_vol:
+                    lot = prochain_lot()
+                    if not lot:
+                        epuise = True
+                        break
+
+                    if cache is not None:
+                        en_cache = cache.get_many([chemin for _, chemin in lot])
+                        trouves = [(i, en_cache[chemin]) for i, chemin in lot if chemin in en_cache]
+                        lot = [(i, chemin) for i, chemin in lot if chemin not in en_cache]
+                        if trouves:
+                            yield trouves
+                        if not lot:
+                            continue
+
+                    future = executor.submit(extraire_lot, [chemin for _, chemin in lot])
+                    en_vol[future] = lot
+
+                if not en_vol:
+                    return
+
+                termines, _ = wait(en_vol, return_when=FIRST_COMPLETED)
+                for future in termines:
+                    lot = en_vol.pop(future)
+                    try:
+                        lot_resultats = future.result()
+                    except Exception as e:
+                        # A crashed worker only loses its own chunk
+                        lot_resultats = [
+                            {"path": chemin, "coords": None, "timestamp": None, "error": str(e)}
+                            for _, chemin in lot
+                        ]
+                    if cache is not None:
+                        cache.put_many(lot_resultats)
+                    yield [(i, resultat) for (i, _), resultat in zip(lot, lot_resultats)]
+        finally:
+            # Stopped early (cancelled or closed): drop the chunks not started yet,
+            # only the ones already running are waited for
+            for future in en_vol:
+                future.cancel()
+
+
+def extraire_metadonnees(chemins, workers=None, backend="thread", on_progress=None,
+                         progress_interval=0.1, chunk_size=None, cache=None):
+    """
+    Extract metadata for many images with a worker pool.
+
+    backend: "thread" or "process".
+    on_progress(done, total) is called at most every progress_interval
+    seconds, plus once at the end.
+    cache: optional MetadataCache; hits skip extraction, misses are stored.
+    Returns one result per input path, in the same order as chemins.
+    """
+    chemins = list(chemins)
+    total = len(chemins)
+    if total == 0:
+        return []
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, total))
+
+    # Several chunks per worker keeps the pool busy while limiting IPC overhead
+    if chunk_size is None:
+        chunk_size = max(1, min(64, total // (workers * 4) or 1))
+
+    resultats = [None] * total
+    fait = 0
+    dernier_rapport = 0.0
+
+    for paires in iter_metadonnees(chemins, workers, backend, chunk_size, cache):
+        for i, resultat in paires:
+            resultats[i] = resultat
+        fait += len(paires)
+        if on_progress and time.monotonic() - dernier_rapport >= progress_interval:
+            dernier_rapport = time.monotonic()
+            on_progress(fait, total)
+
+    if on_progress:
+        on_progress(total, total)
+
+    return resultats
@@ -0,0 +1,414 @@
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from file_manager import iter_images_from_paths, copy_images_to_data, ensure_output_folder
+from gps_utils import distance_cumulee, vitesses
+from itinerary_state import load_state, merge_counts, merge_tracks, save_state
+from jobs import CancelToken
+from metadata_cache import MetadataCache
+from metadata_extractor import iter_metadonnees
+from track import PhotoTrack
+from tracing import Tracer
+
+MIN_IMAGES = 3
+MIN_POINTS = 2
+
+# Provisional snapshots carry at most this many points (evenly decimated)
+PROVISIONAL_MAX_POINTS = 2000
+
+
+class ItineraryError(Exception):
+    """The photos do not allow an itinerary (too few images or GPS points)"""
+
+
+def point_sort_key(point):
+    """Sort key used for every itinerary (ISO timestamps sort chronologically)"""
+    return point.get("timestamp", "") or ""
+
+
+def decouvrir_images(file_paths, **options):
+    """Discovery stage: yield image paths one at a time (recursive walk)"""
+    yield from iter_images_from_paths(file_paths, **options)
+
+
+def convertir_resultat(resultat, nommer=os.path.basename, nom=None):
+    """
+    Conversion stage: turn an extraction result into a photo point (or None).
+    nom: display name of the photo (defaults to nommer(path)).
+    """
+    if resultat["error"] or not resultat["coords"]:
+        return None
+
+    lat, lon = resultat["coords"]
+    timestamp = resultat["timestamp"]
+    return {
+        "path": resultat["path"],
+        "filename": nom if nom is not None else nommer(resultat["path"]),
+        "latitude": lat,
+        "longitude": lon,
+        "timestamp": timestamp.isoformat() if timestamp else ""
+    }
+
+
+def stream_itinerary(image_paths, nommer=os.path.basename, workers=None, backend="thread",
+                     cache=None, first_batch=20, first_delay=0.25, refine_interval=1.0,
+                     chunk_size=16, tracer=None, cancel_token=None,
+                     provisional_max_points=PROVISIONAL_MAX_POINTS, noms=None):
+    """
+    Run discover -> extract -> convert -> accumulate as a streaming pipeline.
+
+    image_paths: iterable of image paths (consumed lazily).
+    nommer(path) gives each photo's display name, unless noms (one display
+    name per input position) is given: several inputs may share a path
+    (identical files stored once) and still keep their own names.
+    Yields snapshots as dicts:
+        points   - photo points so far, sorted by timestamp; provisional
+                   snapshots are decimated to provisional_max_points
+        counts   - {"discovered", "extracted", "geotagged", "errors"}
+        images   - every discovered path (final snapshot only, else None)
+        final    - True for the last snapshot
+    A first provisional snapshot is emitted once first_batch points are
+    available (or first_delay seconds passed with at least 2 points), then
+    one every refine_interval seconds, then the final one.
+    tracer: optional Tracer receiving the discovery, exif and conversion
+    timings: exif is the wall-clock time spent waiting for extracted
+    chunks; per-file extraction times (cache hits excluded) are recorded
+    with record_file.
+    cancel_token: optional jobs.CancelToken; once cancelled, queued chunks
+    are dropped and JobCancelled is raised instead of the final snapshot.
+    """
+    tracer = tracer or Tracer()
+    # (sort key, point) pairs, appended as they arrive and sorted per snapshot
+    entries = []
+    images = []
+    counts = {"discovered": 0, "extracted": 0, "geotagged": 0, "errors": 0}
+    # Discovery runs while waiting for chunks: subtracted from the exif wait
+    duree_decouverte = [0.0]
+
+    def discovered():
+        iterateur = iter(image_paths)
+        while True:
+            debut_decouverte = time.perf_counter()
+            image_path = next(iterateur, None)
+            duree = time.perf_counter() - debut_decouverte
+            duree_decouverte[0] += duree
+            tracer.add("discovery", duree, count=0 if image_path is None else 1)
+            if image_path is None:
+                return
+            images.append(image_path)
+            counts["discovered"] += 1
+            yield image_path
+
+    def snapshot(final=False):
+        # Timsort is near-linear here: a sorted prefix plus the new chunk
+        entries.sort(key=lambda entry: entry[0])
+        if final:
+            points = [point for _, point in entries]
+        else:
+            step = max(1, math.ceil(len(entries) / provisional_max_points))
+            points = [point for _, point in entries[::step]]
+            if step > 1 and points[-1] is not entries[-1][1]:
+                points.append(entries[-1][1])
+        return {
+            "points": points,
+            "counts": dict(counts),
+            "images": list(images) if final else None,
+            "final": final
+        }
+
+    debut = time.monotonic()
+    dernier_envoi = None
+
+    lots = iter_metadonnees(discovered(), workers, backend, chunk_size, cache, cancel_token)
+    while True:
+        debut_attente = time.perf_counter()
+        decouverte_avant = duree_decouverte[0]
+        paires = next(lots, None)
+        attente = time.perf_counter() - debut_attente - (duree_decouverte[0] - decouverte_avant)
+        tracer.add("exif", attente, count=len(paires) if paires else 0)
+        if paires is None:
+            break
+
+        debut_conversion = time.perf_counter()
+        for index, resultat in paires:
+            counts["extracted"] += 1
+            if "seconds" in resultat:
+                tracer.record_file("exif", resultat["path"], resultat["seconds"])
+            if resultat["error"]:
+                counts["errors"] += 1
+                print(f"Erreur lors de l'extraction de {resultat['path']}: {resultat['error']}")
+                continue
+
+            point = convertir_resultat(resultat, nommer, noms[index] if noms is not None else None)
+            if point is None:
+                continue
+
+            # Accumulate stage (input index breaks ties so the order is deterministic)
+            entries.append(((point_sort_key(point), index), point))
+            counts["geotagged"] += 1
+        tracer.add("conversion", time.perf_counter() - debut_conversion, count=len(paires))
+
+        maintenant = time.monotonic()
+        if dernier_envoi is None:
+            pret = len(entries) >= first_batch or (
+                len(entries) >= 2 and maintenant - debut >= first_delay)
+        else:
+            pret = maintenant - dernier_envoi >= refine_interval
+
+        if pret:
+            dernier_envoi = maintenant
+            yield snapshot()
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    yield snapshot(final=True)
+
+
+def run_itinerary(file_paths, output_dir, ingestion_mode="reference",
+                  data_folder="data/images", cache=None, tracer=None, workers=None,
+                  backend="thread", offline=False, on_status=None, on_preview=None,
+                  cancel_token=None, thumbnails=None, html_format="folium", gzip_html=False,
+                  append=False):
+    """
+    Full itinerary pipeline, independent of any UI.
+
+    output_dir: folder receiving route_map.html and map_preview.png, one per
+    run (job_queue.JobQueue gives every job its own folder).
+
+    ingestion_mode: "reference" reads the user's files where they are;
+    "copy" first stores them in data_folder.
+    cache: MetadataCache to use (one is opened, and closed, if None).
+    on_status(text) reports progress; on_preview(map_path, image) is
+    called with provisional previews while extraction runs (they are only
+    generated when on_preview is given). Provisional previews are simple
+    tile-less PIL images of a decimated route, rendered on their own thread
+    so extraction never waits for them, and never written to disk; the HTML
+    map is only written once, at the end, so map_path does not exist yet
+    when on_preview is called.
+    cancel_token: optional jobs.CancelToken, checked between files, EXIF
+    chunks and stages; cancelling raises JobCancelled.
+    thumbnails: optional ThumbnailService; the map popups then show each
+    photo's thumbnail.
+    html_format: "folium" (self-contained page) or "compact" (shared
+    minified page plus a packed data sidecar, see compact_map);
+    gzip_html also writes .gz copies of the compact files.
+    append: add file_paths to the itinerary already in output_dir (see
+    itinerary_state, saved by every run): only the images not read yet are
+    read, their points are merged into the saved track and the maps are
+    rewritten. Provisional previews are skipped, the new photos are few.
+    Returns a dict: map_path, map_image_path, map_image (the preview as a
+    PIL image, so it need not be read back), points, images, counts, tracer.
+    Raises ItineraryError when there are too few images or GPS points.
+    """
+    # folium and the map renderers are only loaded when a map is generated
+    from map_plotter import (generate_itinerary_map, render_simple_map_image, render_static_map_image,
+                             save_preview)
+    if html_format == "compact":
+        from compact_map import generate_compact_map
+
+        def generate_html_map(track, map_path, thumbnails=None):
+            return generate_compact_map(track, map_path, thumbnails=thumbnails, gzip_output=gzip_html)
+    else:
+        generate_html_map = generate_itinerary_map
+
+    tracer = tracer or Tracer()
+    token = cancel_token or CancelToken()
+    status = on_status or (lambda text: None)
+
+    previous = None
+    if append:
+        previous = load_state(output_dir)
+        if previous is None:
+            raise ItineraryError("Aucun itinéraire à compléter dans ce dossier")
+        known = {os.path.abspath(path) for path in previous["images"]}
+        on_preview = None
+
+    status("Extraction des données GPS...")
+
+    if ingestion_mode == "copy":
+        # Copy images to data folder before reading them
+        with tracer.span("discovery"):
+            images = []
+            for image_path in iter_images_from_paths(file_paths):
+                token.raise_if_cancelled()
+                images.append(image_path)
+        ensure_output_folder(data_folder)
+        with tracer.span("copy", files=len(images)):
+            source_images = copy_images_to_data(images, data_folder, cancel_token=token)
+        if previous is not None:
+            # Same content, same store path: already in the itinerary
+            kept = [i for i, source in enumerate(source_images)
+                    if os.path.abspath(source) not in known]
+            source_images = [source_images[i] for i in kept]
+            images = [images[i] for i in kept]
+
+        # Store paths are content hashes; keep the original names for display,
+        # per input position (identical files share one store path)
+        noms = [os.path.basename(original) for original in images]
+        # Store files are named after their content hash
+        content_hashes = {source: os.path.splitext(os.path.basename(source))[0]
+                          for source in source_images}
+    else:
+        # Read metadata straight from the user's files, as they are found
+        source_images = decouvrir_images(file_paths)
+        noms = None
+        if previous is not None:
+            source_images = (path for path in source_images if os.path.abspath(path) not in known)
+        content_hashes = None
+
+    ensure_output_folder(output_dir)
+    map_path = os.path.join(output_dir, "route_map.html")
+    map_image_path = os.path.join(output_dir, "map_preview.png")
+
+    def render_provisional(points):
+        if token.cancelled:
+            return
+        track = PhotoTrack.from_points(points)
+        with tracer.span("preview", points=len(track), provisional=True):
+            image = render_simple_map_image(track)
+        if image is not None and not token.cancelled:
+            on_preview(map_path, image)
+
+    # One provisional render at a time; snapshots arriving meanwhile are skipped
+    preview_executor = None
+    if on_preview is not None:
+        preview_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="provisional")
+    rendu_en_cours = None
+
+    owns_cache = cache is None
+    if owns_cache:
+        cache = MetadataCache()
+    try:
+        for snapshot in stream_itinerary(source_images, noms=noms, workers=workers,
+                                         backend=backend, cache=cache, tracer=tracer,
+                                         cancel_token=token):
+            counts = snapshot["counts"]
+            status(f"Trouvées : {counts['discovered']}  •  "
+                   f"Lues : {counts['extracted']}  •  "
+                   f"Avec GPS : {counts['geotagged']}")
+
+            if snapshot["final"] or preview_executor is None:
+                continue
+            if rendu_en_cours is not None and not rendu_en_cours.done():
+                continue
+            rendu_en_cours = preview_executor.submit(render_provisional, snapshot["points"])
+    finally:
+        if preview_executor is not None:
+            # The final preview must not be overwritten by a late provisional one
+            preview_executor.shutdown(wait=True, cancel_futures=True)
+        if owns_cache:
+            cache.close()
+
+    images = snapshot["images"]
+    points = snapshot["points"]
+    counts = snapshot["counts"]
+    # Sorted, columnar track shared by both renderers
+    track = PhotoTrack.from_points(points)
+
+    if previous is not None:
+        if not images:
+            raise ItineraryError("Aucune nouvelle image à ajouter à l'itinéraire")
+        with tracer.span("merge", points=len(track)):
+            track = merge_tracks(previous["track"], track)
+            images = previous["images"] + images
+            counts = merge_counts(previous["counts"], counts)
+            points = track.to_points()
+
+    if len(images) < MIN_IMAGES:
+        raise ItineraryError(f"Pas assez d'images valides trouvées (minimum {MIN_IMAGES})")
+    if len(points) < MIN_POINTS:
+        raise ItineraryError(
+            f"Pas assez de données GPS trouvées dans les images (minimum {MIN_POINTS})")
+
+    status(f"Génération de la carte ({len(points)} points)...")
+
+    # Popup thumbnails are generated in the background while the preview
+    # tiles are fetched; the HTML map waits for them
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnail-links") as executor:
+        pending_thumbnails = None
+        if thumbnails is not None:
+            token.raise_if_cancelled()
+            pending_thumbnails = executor.submit(thumbnail_links, thumbnails, points, output_dir,
+                                                 content_hashes, token)
+
+        token.raise_if_cancelled()
+        status("Création de l'aperçu...")
+        with tracer.span("preview", points=len(track)):
+            map_image = render_static_map_image(track, offline=offline)
+            if map_image is not None:
+                save_preview(map_image, map_image_path)
+            else:
+                map_image_path = None
+
+        thumbnail_urls = None
+        if pending_thumbnails is not None:
+            # Only the wait beyond the preview is timed
+            with tracer.span("thumbnails", points=len(points)):
+                thumbnail_urls = pending_thumbnails.result()
+
+    token.raise_if_cancelled()
+    with tracer.span("html_map", points=len(track)):
+        map_path = generate_html_map(track, map_path, thumbnails=thumbnail_urls)
+    token.raise_if_cancelled()
+    save_state(output_dir, track, images, counts)
+
+    return {
+        "map_path": map_path,
+        "map_image_path": map_image_path,
+        "map_image": map_image,
+        "points": points,
+        "images": images,
+        "counts": counts,
+        "tracer": tracer,
+    }
+
+
+def thumbnail_links(thumbnails, points, output_dir, content_hashes=None, cancel_token=None):
+    """
+    {photo path: thumbnail path relative to output_dir} for the map popups.
+    content_hashes: optional {photo path: SHA-256} already known.
+    cancel_token: stops the generation (raises JobCancelled).
+    """
+    generated = thumbnails.get_many([point["path"] for point in points],
+                                    content_hashes=content_hashes, cancel_token=cancel_token)
+    links = {}
+    for point in points:
+        thumbnail_path = generated.get(point["path"])
+        if thumbnail_path:
+            links[point["path"]] = os.path.relpath(thumbnail_path, output_dir).replace(os.sep, "/")
+    return links
+
+
+def itinerary_summary(result):
+    """JSON-serializable summary of a run_itinerary result"""
+    track = PhotoTrack.from_points(result["points"])
+    dated = [i for i in range(len(track)) if track.has_timestamp(i)]
+    min_lat, max_lat, min_lon, max_lon = track.bounds()
+    distance = distance_cumulee(track.lat, track.lon)
+    # Speeds between consecutive dated photos (NaN when taken the same second)
+    speeds = vitesses(track.lat[dated], track.lon[dated], track.timestamps[dated])
+    speeds = speeds[np.isfinite(speeds)]
+
+    return {
+        "map": result["map_path"],
+        "preview": result["map_image_path"],
+        "counts": result["counts"],
+        "points": len(track),
+        "start": track.datetime_at(dated[0]).isoformat() if dated else None,
+        "end": track.datetime_at(dated[-1]).isoformat() if dated else None,
+        "distance_km": round(float(distance[-1]) / 1000, 3) if len(distance) else 0.0,
+        "max_speed_kmh": round(float(speeds.max()) * 3.6, 1) if len(speeds) else None,
+        "bounds": {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon},
+        "timings": result["tracer"].to_dict()["stages"],
+    }
+
+
+def write_summary(summary, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False, default=str)
+    return path
@@ -0,0 +1,174 @@
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from simplify import douglas_peucker
+
+BACKGROUND_COLOR = '#f3f4f6'
+ROUTE_COLOR = '#173DED'
+PREVIEW_TOLERANCE_PX = 0.5
+
+# (fill, glow) per marker role
+MARKER_COLORS = {
+    "start": ('#10b981', '#6ee7b7'),
+    "middle": ('#3b82f6', '#93c5fd'),
+    "end": ('#ef4444', '#fca5a5'),
+}
+
+LEGEND_ITEMS = [
+    ('#10b981', 'Départ'),
+    ('#3b82f6', 'Points'),
+    ('#ef4444', 'Arrivée')
+]
+
+
+@lru_cache(maxsize=None)
+def load_font(size):
+    """Arial at the given size, or Pillow's default font (loaded once per size)"""
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=None)
+def marker_sprite(fill, glow, radius):
+    """Prebuilt RGBA stamp: glow disc + white-outlined marker disc"""
+    glow_radius = radius + 4
+    size = 2 * glow_radius + 1
+    sprite = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+    c = glow_radius
+    draw.ellipse([0, 0, size - 1, size - 1], fill=glow)
+    draw.ellipse([c - radius, c - radius, c + radius, c + radius],
+                 fill=fill, outline='white', width=3)
+    return sprite
+
+
+class SimpleMapRenderer:
+    """
+    Tile-less itinerary preview renderer.
+    Fonts and marker sprites are cached across renders, points are projected
+    in one vectorized pass and markers are pasted as prebuilt stamps.
+    Numbers are only drawn on markers that do not overlap another one.
+    """
+
+    def __init__(self, width=800, height=600, padding=60, radius=14, max_labels=500):
+        self.width = width
+        self.height = height
+        self.padding = padding
+        self.radius = radius
+        self.max_labels = max_labels
+
+    def padded_bounds(self, track):
+        """Track bounds with 10% margin: (min_lat, max_lat, min_lon, max_lon)"""
+        min_lat, max_lat, min_lon, max_lon = track.bounds()
+
+        # Add padding (10%)
+        lat_range = max_lat - min_lat or 0.01
+        lon_range = max_lon - min_lon or 0.01
+
+        return (min_lat - lat_range * 0.1, max_lat + lat_range * 0.1,
+                min_lon - lon_range * 0.1, max_lon + lon_range * 0.1)
+
+    def project(self, track, bounds=None):
+        """Pixel coordinates (int arrays) of every point of the track"""
+        min_lat, max_lat, min_lon, max_lon = bounds or self.padded_bounds(track)
+
+        drawable_width = self.width - 2 * self.padding
+        drawable_height = self.height - 2 * self.padding
+
+        x = self.padding + (track.lon - min_lon) / (max_lon - min_lon) * drawable_width
+        y = self.padding + (max_lat - track.lat) / (max_lat - min_lat) * drawable_height
+        return x.astype(np.int64), y.astype(np.int64)
+
+    def labelled_points(self, x, y):
+        """Indices of points whose marker overlaps no other marker"""
+        if len(x) > self.max_labels * 20:
+            return np.zeros(0, dtype=np.int64)
+
+        cell = 2 * self.radius
+        cells = (x // cell) * 100003 + (y // cell)
+        _, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+        alone = counts[inverse] == 1
+
+        # Markers in neighbouring cells can still overlap: check exact distances
+        candidates = np.flatnonzero(alone)
+        if len(candidates) > self.max_labels:
+            return np.zeros(0, dtype=np.int64)
+
+        keep = []
+        min_dist_sq = cell * cell
+        for i in candidates:
+            d2 = (x - x[i]) ** 2 + (y - y[i]) ** 2
+            d2[i] = min_dist_sq
+            if d2.min() >= min_dist_sq:
+                keep.append(i)
+        return np.array(keep, dtype=np.int64)
+
+    def render(self, track, bounds=None):
+        """Render the track to a new RGB PIL image"""
+        img = Image.new('RGB', (self.width, self.height), BACKGROUND_COLOR)
+        draw = ImageDraw.Draw(img)
+
+        x, y = self.project(track, bounds)
+
+        # Draw route line (vertices closer than half a pixel are dropped)
+        kept = douglas_peucker(x, y, PREVIEW_TOLERANCE_PX)
+        draw.line(list(zip(x[kept].tolist(), y[kept].tolist())), fill=ROUTE_COLOR, width=4)
+
+        self.draw_markers(img, x, y, np.arange(len(x)))
+        self.draw_labels(draw, x, y, self.labelled_points(x, y))
+        self.draw_decorations(draw)
+        return img
+
+    def draw_markers(self, img, x, y, indices):
+        """Paste marker stamps for the given point indices (start/end on top)"""
+        count = len(x)
+        glow_radius = self.radius + 4
+        middle = marker_sprite(*MARKER_COLORS["middle"], self.radius)
+
+        # Middle markers: one stamp per distinct pixel, in route order
+        middle_indices = indices[(indices > 0) & (indices < count - 1)]
+        if len(middle_indices):
+            pixels = x[middle_indices] * (self.height + 1) + y[middle_indices]
+            _, last_first = np.unique(pixels[::-1], return_index=True)
+            order = middle_indices[np.sort(len(pixels) - 1 - last_first)]
+            for i in order.tolist():
+                img.paste(middle, (int(x[i]) - glow_radius, int(y[i]) - glow_radius), middle)
+
+        # Start and end markers on top
+        for i, role in ((0, "start"), (count - 1, "end")):
+            if i in indices:
+                sprite = marker_sprite(*MARKER_COLORS[role], self.radius)
+                img.paste(sprite, (int(x[i]) - glow_radius, int(y[i]) - glow_radius), sprite)
+
+    def draw_labels(self, draw, x, y, indices):
+        """Point numbers, only where they stay readable"""
+        font = load_font(14)
+        for i in indices.tolist():
+            text = str(i + 1)
+            bbox = draw.textbbox((0, 0), text, font=font)
+            text_width = bbox[2] - bbox[0]
+            text_height = bbox[3] - bbox[1]
+            draw.text((int(x[i]) - text_width // 2, int(y[i]) - text_height // 2), text,
+                      fill='white', font=font)
+
+    def draw_decorations(self, draw):
+        """Title and legend"""
+        # Add title
+        draw.text((20, 20), "Votre Itinéraire", fill='#1f2937', font=load_font(24))
+
+        # Add legend
+        legend_y = self.height - 40
+        legend_x = 20
+        legend_font = load_font(12)
+        for color, label in LEGEND_ITEMS:
+            draw.ellipse([legend_x, legend_y, legend_x + 15, legend_y + 15],
+                         fill=color, outline='white', width=2)
+            draw.text((legend_x + 20, legend_y), label, fill='#6b7280', font=legend_font)
+            legend_x += 100
+
+
+DEFAULT_RENDERER = SimpleMapRenderer()
@@ -0,0 +1,73 @@
+import math
+
+import numpy as np
+
+from gps_utils import EARTH_RADIUS_M
+
+# Web Mercator ground resolution at zoom 0 on the equator (meters per pixel)
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def douglas_peucker(x, y, tolerance):
+    """
+    Douglas–Peucker simplification of a planar polyline.
+    Returns the sorted indices of the vertices to keep (first and last
+    are always kept). Distances are measured to the segment, not the
+    infinite line, so back-and-forth tracks keep their turning points.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= 2 or tolerance <= 0:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        px = x[start + 1:end] - x[start]
+        py = y[start + 1:end] - y[start]
+
+        length_sq = dx * dx + dy * dy
+        if length_sq == 0:
+            distances = np.hypot(px, py)
+        else:
+            t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0)
+            distances = np.hypot(px - t * dx, py - t * dy)
+
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return np.flatnonzero(keep)
+
+
+def project_local_meters(lat, lon):
+    """Equirectangular projection around the track's mean latitude (meters)"""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    lat0 = math.radians(float(np.mean(lat))) if len(lat) else 0.0
+    x = np.radians(lon) * EARTH_RADIUS_M * math.cos(lat0)
+    y = np.radians(lat) * EARTH_RADIUS_M
+    return x, y
+
+
+def simplify_latlon(lat, lon, tolerance_m):
+    """Indices of the vertices kept when simplifying a lat/lon track at tolerance_m meters"""
+    x, y = project_local_meters(lat, lon)
+    return douglas_peucker(x, y, tolerance_m)
+
+
+def meters_per_pixel(zoom, latitude):
+    """Web Mercator ground resolution at the given zoom and latitude"""
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom)
@@ -0,0 +1,229 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from exif_reader import lire_miniature_exif
+from file_manager import ensure_output_folder, hash_file, load_store_index, save_store_index
+
+DEFAULT_THUMBNAIL_FOLDER = "data/cache/thumbnails"
+THUMBNAIL_SIZE = (160, 160)
+THUMBNAIL_QUALITY = 80
+# How often get_many checks its cancel token while waiting
+CANCEL_POLL_SECONDS = 0.1
+
+# EXIF orientation -> transpositions bringing the image upright (as ImageOps.exif_transpose)
+ORIENTATION_TRANSPOSE = {
+    2: (Image.Transpose.FLIP_LEFT_RIGHT,),
+    3: (Image.Transpose.ROTATE_180,),
+    4: (Image.Transpose.FLIP_TOP_BOTTOM,),
+    5: (Image.Transpose.TRANSPOSE,),
+    6: (Image.Transpose.ROTATE_270,),
+    7: (Image.Transpose.TRANSVERSE,),
+    8: (Image.Transpose.ROTATE_90,),
+}
+
+
+def apply_orientation(image, orientation):
+    for method in ORIENTATION_TRANSPOSE.get(orientation, ()):
+        image = image.transpose(method)
+    return image
+
+
+def embedded_thumbnail(image_path, size):
+    """
+    The EXIF thumbnail, upright, if it is large enough for size
+    (None otherwise). Only the file header is read.
+    """
+    try:
+        data, orientation = lire_miniature_exif(image_path)
+    except ValueError:
+        return None
+    if data is None:
+        return None
+
+    try:
+        thumbnail = Image.open(io.BytesIO(data))
+        thumbnail.load()
+    except OSError:
+        return None
+
+    # Embedded thumbnails are ~160x120: do not upscale them for larger requests
+    if thumbnail.width < size[0] and thumbnail.height < size[1]:
+        return None
+    return apply_orientation(thumbnail.convert("RGB"), orientation)
+
+
+def draft_thumbnail(image_path, size):
+    """
+    Reduced-scale decode: for JPEG, draft() makes libjpeg decode at 1/2,
+    1/4 or 1/8 scale, so the full-resolution image is never built.
+    """
+    with Image.open(image_path) as image:
+        image.draft("RGB", size)
+        orientation = image.getexif().get(0x0112, 1)
+        thumbnail = image.convert("RGB")
+    thumbnail.thumbnail(size, Image.Resampling.LANCZOS)
+    return apply_orientation(thumbnail, orientation)
+
+
+def make_thumbnail(image_path, size=THUMBNAIL_SIZE):
+    """Thumbnail fitting in size: embedded EXIF thumbnail first, then draft decode"""
+    thumbnail = embedded_thumbnail(image_path, size)
+    if thumbnail is None:
+        return draft_thumbnail(image_path, size)
+    thumbnail.thumbnail(size, Image.Resampling.LANCZOS)
+    return thumbnail
+
+
+class ThumbnailService:
+    """
+    Thumbnails cached on disk by content hash (folder/ab/<sha256>_WxH.jpg),
+    generated on a small background pool. Identical photos share one
+    thumbnail; concurrent requests for the same one share one task.
+    Content hashes are kept in an index (path -> size, mtime, hash, the
+    image store's format), so a photo is hashed at most once while it is
+    unchanged, and hashes already computed elsewhere (ingestion, the image
+    store) are reused: finding a cached thumbnail never re-reads the photo.
+    """
+
+    def __init__(self, folder=DEFAULT_THUMBNAIL_FOLDER, size=THUMBNAIL_SIZE, workers=2):
+        self.folder = folder
+        self.size = tuple(size)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                           thread_name_prefix="thumbnails")
+        # Reentrant: a future finishing early runs its done callback while held
+        self.lock = threading.RLock()
+        self.pending = {}
+        self.hashes = None
+        self.hashes_changed = False
+
+    def cache_path(self, content_hash, size=None):
+        width, height = size or self.size
+        return os.path.join(self.folder, content_hash[:2], f"{content_hash}_{width}x{height}.jpg")
+
+    def content_hash(self, image_path):
+        """SHA-256 of image_path, from the index while the file is unchanged"""
+        st = os.stat(image_path)
+        key = os.path.abspath(image_path)
+        with self.lock:
+            if self.hashes is None:
+                self.hashes = load_store_index(self.folder)
+            entry = self.hashes.get(key)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        content_hash = hash_file(image_path)
+        self.remember(image_path, content_hash, st)
+        return content_hash
+
+    def remember(self, image_path, content_hash, st=None):
+        """Record the SHA-256 of image_path computed elsewhere"""
+        st = st or os.stat(image_path)
+        with self.lock:
+            if self.hashes is None:
+                self.hashes = load_store_index(self.folder)
+            self.hashes[os.path.abspath(image_path)] = [st.st_size, st.st_mtime_ns, content_hash]
+            self.hashes_changed = True
+
+    def save_hashes(self):
+        with self.lock:
+            if not self.hashes_changed:
+                return
+            hashes = dict(self.hashes)
+            self.hashes_changed = False
+        ensure_output_folder(self.folder)
+        save_store_index(self.folder, hashes)
+
+    def get(self, image_path, content_hash=None, size=None):
+        """
+        Path of the thumbnail of image_path, generated now if not cached.
+        content_hash: the file's SHA-256 if already known (saves a read).
+        Returns None if the image cannot be decoded.
+        """
+        size = tuple(size or self.size)
+        if content_hash:
+            self.remember(image_path, content_hash)
+        else:
+            content_hash = self.content_hash(image_path)
+        thumbnail_path = self.cache_path(content_hash, size)
+        if os.path.exists(thumbnail_path):
+            return thumbnail_path
+
+        try:
+            thumbnail = make_thumbnail(image_path, size)
+        except OSError as e:
+            print(f"Miniature impossible pour {image_path}: {e}")
+            return None
+
+        ensure_output_folder(os.path.dirname(thumbnail_path))
+        # Per writer: batch processes may share the thumbnail folder
+        tmp_path = f"{thumbnail_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        thumbnail.save(tmp_path, "JPEG", quality=THUMBNAIL_QUALITY)
+        os.replace(tmp_path, thumbnail_path)
+        return thumbnail_path
+
+    def request(self, image_path, content_hash=None, size=None):
+        """Generate in the background; returns a Future of the thumbnail path"""
+        return self._request(image_path, content_hash, size)[0]
+
+    def _request(self, image_path, content_hash, size):
+        """(future, True if this call submitted it rather than joined a pending one)"""
+        key = (image_path, content_hash, tuple(size or self.size))
+        with self.lock:
+            future = self.pending.get(key)
+            if future is not None:
+                return future, False
+            future = self.executor.submit(self.get, image_path, content_hash, size)
+            self.pending[key] = future
+            future.add_done_callback(lambda _: self._forget(key))
+        return future, True
+
+    def _forget(self, key):
+        with self.lock:
+            self.pending.pop(key, None)
+
+    def get_many(self, image_paths, size=None, content_hashes=None, cancel_token=None):
+        """
+        {image path: thumbnail path or None}, generated on the pool.
+        content_hashes: optional {image path: SHA-256} already known.
+        cancel_token: optional jobs.CancelToken; once cancelled, the
+        thumbnails this call queued are dropped and JobCancelled is raised
+        (requests shared with other callers keep running).
+        """
+        content_hashes = content_hashes or {}
+        futures = {}
+        owned = []
+        for path in image_paths:
+            future, created = self._request(path, content_hashes.get(path), size)
+            futures[path] = future
+            if created:
+                owned.append(future)
+
+        results = {}
+        try:
+            for path, future in futures.items():
+                while True:
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    try:
+                        results[path] = future.result(timeout=CANCEL_POLL_SECONDS)
+                        break
+                    except TimeoutError:
+                        continue
+                    except Exception as e:
+                        print(f"Miniature impossible pour {path}: {e}")
+                        results[path] = None
+                        break
+        except BaseException:
+            for future in owned:
+                future.cancel()
+            raise
+        finally:
+            self.save_hashes()
+        return results
+
+    def close(self, wait=False):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        self.save_hashes()
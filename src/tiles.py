@@ -0,0 +1,432 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from file_manager import ensure_output_folder
+
+OSM_URL_TEMPLATE = "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png"
+DEFAULT_TILE_CACHE_PATH = "data/cache/tiles.sqlite"
+DEFAULT_TILE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Batch runs share the cache between processes: wait for locks instead of failing
+BUSY_TIMEOUT_SECONDS = 30
+USER_AGENT = "Localy/1.0 (itinerary preview)"
+
+# staticmap only sees this template; CachedStaticMap.get() parses it back
+TILE_KEY_TEMPLATE = "{z}/{x}/{y}"
+
+
+class TileSource:
+    """Base class: returns the bytes of tile (z, x, y), or None if unavailable"""
+
+    def get_tile(self, z, x, y):
+        raise NotImplementedError
+
+    def get_many(self, keys):
+        """Fetch several (z, x, y) tiles; returns {(z, x, y): bytes or None}"""
+        return {key: self.get_tile(*key) for key in keys}
+
+    def close(self):
+        pass
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least 1 / rate seconds apart"""
+
+    def __init__(self, rate_per_host=10.0):
+        self.interval = 1.0 / rate_per_host if rate_per_host else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class FetchMetrics:
+    """Counters and timings of tile downloads (thread-safe)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.tiles = 0
+        self.failures = 0
+        self.retries = 0
+        self.bytes = 0
+        self.durations = []
+
+    def record(self, duration, size=None, retry=False, failed=False):
+        with self.lock:
+            self.requests += 1
+            self.durations.append(duration)
+            if retry:
+                self.retries += 1
+            if failed:
+                self.failures += 1
+            if size is not None:
+                self.tiles += 1
+                self.bytes += size
+
+    def summary(self):
+        """Dict of totals plus mean / p95 / max fetch time in milliseconds"""
+        with self.lock:
+            durations = sorted(self.durations)
+            result = {
+                "requests": self.requests,
+                "tiles": self.tiles,
+                "failures": self.failures,
+                "retries": self.retries,
+                "bytes": self.bytes,
+            }
+        if durations:
+            result["mean_ms"] = 1000 * sum(durations) / len(durations)
+            result["p95_ms"] = 1000 * durations[min(len(durations) - 1, int(0.95 * len(durations)))]
+            result["max_ms"] = 1000 * durations[-1]
+        return result
+
+
+class HttpTileSource(TileSource):
+    """
+    Tiles downloaded from an XYZ tile server.
+    Uses one keep-alive connection pool, a bounded download pool for
+    get_many(), a per-host rate limit and retries with exponential backoff.
+    url_template may contain {s}, rotated over subdomains.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, url_template=OSM_URL_TEMPLATE, timeout=10, headers=None, max_workers=4,
+                 rate_per_host=10.0, max_retries=3, backoff=0.25, subdomains="abc"):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url_template = url_template
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.subdomains = subdomains
+        self.rate_limiter = HostRateLimiter(rate_per_host)
+        self.metrics = FetchMetrics()
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {"User-Agent": USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def tile_url(self, z, x, y):
+        subdomain = self.subdomains[(x + y) % len(self.subdomains)] if self.subdomains else ""
+        return self.url_template.format(z=z, x=x, y=y, s=subdomain)
+
+    def get_tile(self, z, x, y):
+        import requests
+        from urllib.parse import urlsplit
+
+        url = self.tile_url(z, x, y)
+        host = urlsplit(url).netloc
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            self.rate_limiter.wait(host)
+
+            debut = time.perf_counter()
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                self.metrics.record(time.perf_counter() - debut, retry=attempt > 0, failed=True)
+                print(f"Échec du téléchargement de la tuile {url}: {e}")
+                continue
+
+            duree = time.perf_counter() - debut
+            if response.status_code == 200:
+                self.metrics.record(duree, size=len(response.content), retry=attempt > 0)
+                return response.content
+
+            self.metrics.record(duree, retry=attempt > 0, failed=True)
+            if response.status_code not in self.RETRY_STATUS:
+                return None
+
+        return None
+
+    def get_many(self, keys):
+        """Download many tiles concurrently; returns {(z, x, y): bytes or None}"""
+        keys = list(keys)
+        if len(keys) <= 1:
+            return super().get_many(keys)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda key: self.get_tile(*key), keys)
+            return dict(zip(keys, results))
+
+    def close(self):
+        self.session.close()
+
+
+class DirectoryTileSource(TileSource):
+    """Tiles read from a local {z}/{x}/{y}.png directory tree"""
+
+    def __init__(self, root, pattern="{z}/{x}/{y}.png"):
+        self.root = root
+        self.pattern = pattern
+
+    def get_tile(self, z, x, y):
+        path = os.path.join(self.root, self.pattern.format(z=z, x=x, y=y))
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+class MBTilesSource(TileSource):
+    """Tiles read from an MBTiles (SQLite, TMS row order) file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def get_tile(self, z, x, y):
+        tms_y = (1 << z) - 1 - y
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, tms_y)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class TileCache:
+    """
+    Persistent tile store (one SQLite file) with a size cap and
+    least-recently-used eviction.
+    """
+
+    def __init__(self, db_path=DEFAULT_TILE_CACHE_PATH, max_bytes=DEFAULT_TILE_CACHE_MAX_BYTES,
+                 namespace="osm"):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            ensure_output_folder(directory)
+
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tiles (
+                namespace TEXT NOT NULL,
+                z INTEGER NOT NULL,
+                x INTEGER NOT NULL,
+                y INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, z, x, y)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tiles_access ON tiles(last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+
+    def get(self, z, x, y):
+        """Cached tile bytes, or None"""
+        key = (self.namespace, z, x, y)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM tiles WHERE namespace = ? AND z = ? AND x = ? AND y = ?",
+                key).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE tiles SET last_access = ? WHERE namespace = ? AND z = ? AND x = ? AND y = ?",
+                (time.time(),) + key)
+            self.conn.commit()
+        return row[0]
+
+    def put(self, z, x, y, data):
+        """Store a tile, evicting least recently used tiles above max_bytes"""
+        key = (self.namespace, z, x, y)
+        with self.lock:
+            previous = self.conn.execute(
+                "SELECT size FROM tiles WHERE namespace = ? AND z = ? AND x = ? AND y = ?",
+                key).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tiles (namespace, z, x, y, data, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (data, len(data), time.time()))
+            self.total_bytes += len(data) - (previous[0] if previous else 0)
+            self.evict()
+            self.conn.commit()
+
+    def evict(self):
+        """Drop least recently used tiles until under max_bytes (lock held)"""
+        if not self.max_bytes:
+            return
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT namespace, z, x, y, size FROM tiles ORDER BY last_access ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            for namespace, z, x, y, size in rows:
+                self.conn.execute(
+                    "DELETE FROM tiles WHERE namespace = ? AND z = ? AND x = ? AND y = ?",
+                    (namespace, z, x, y))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    return
+
+    def clear(self):
+        """Remove every cached tile"""
+        with self.lock:
+            self.conn.execute("DELETE FROM tiles")
+            self.conn.commit()
+            self.total_bytes = 0
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class CachedTileSource(TileSource):
+    """
+    Read-through cache in front of another source.
+    In offline mode the upstream source is never called.
+    """
+
+    def __init__(self, upstream, cache, offline=False):
+        self.upstream = upstream
+        self.cache = cache
+        self.offline = offline
+
+    def get_tile(self, z, x, y):
+        return self.get_many([(z, x, y)])[(z, x, y)]
+
+    def get_many(self, keys):
+        """Cache hits first, then one concurrent upstream batch for the misses"""
+        results = {key: self.cache.get(*key) for key in keys}
+        missing = [key for key, data in results.items() if data is None]
+        if not missing or self.offline or self.upstream is None:
+            return results
+
+        for key, data in self.upstream.get_many(missing).items():
+            if data is not None:
+                self.cache.put(*key, data)
+            results[key] = data
+        return results
+
+    def close(self):
+        if self.upstream is not None:
+            self.upstream.close()
+        self.cache.close()
+
+
+def default_tile_source(offline=False):
+    """OpenStreetMap tiles behind the persistent on-disk cache"""
+    return CachedTileSource(HttpTileSource(), TileCache(), offline=offline)
+
+
+class TilesUnavailable(Exception):
+    """Some tiles of a static map could not be found (offline cache miss or download failure)"""
+
+
+def lon_to_tile_x(lon, zoom):
+    """Longitude -> fractional tile column (Web Mercator)"""
+    return (lon + 180.0) / 360.0 * (1 << zoom)
+
+
+def lat_to_tile_y(lat, zoom):
+    """Latitude -> fractional tile row (Web Mercator, XYZ origin at the top)"""
+    lat_rad = math.radians(lat)
+    return (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * (1 << zoom)
+
+
+def fit_view(static_map, max_zoom=17):
+    """
+    (zoom, [lon, lat] center) showing all of static_map's features, from
+    its public determine_extent(): the highest zoom at which they fit
+    inside the padding.
+    """
+    padding_x, padding_y = static_map.padding
+    for zoom in range(max_zoom, -1, -1):
+        min_lon, min_lat, max_lon, max_lat = static_map.determine_extent(zoom=zoom)
+        width = (lon_to_tile_x(max_lon, zoom) - lon_to_tile_x(min_lon, zoom)) * static_map.tile_size
+        height = (lat_to_tile_y(min_lat, zoom) - lat_to_tile_y(max_lat, zoom)) * static_map.tile_size
+        if width <= static_map.width - 2 * padding_x and height <= static_map.height - 2 * padding_y:
+            break
+    return zoom, [(min_lon + max_lon) / 2, (min_lat + max_lat) / 2]
+
+
+def visible_tiles(width, height, zoom, center, tile_size=256, reverse_y=False):
+    """(z, x, y) keys covering a width x height view of zoom centered on [lon, lat]"""
+    x_center = lon_to_tile_x(center[0], zoom)
+    y_center = lat_to_tile_y(center[1], zoom)
+    half_width = 0.5 * width / tile_size
+    half_height = 0.5 * height / tile_size
+    x_min = int(math.floor(x_center - half_width))
+    y_min = int(math.floor(y_center - half_height))
+    x_max = int(math.ceil(x_center + half_width))
+    y_max = int(math.ceil(y_center + half_height))
+
+    max_tile = 1 << zoom
+    keys = []
+    for x in range(x_min, x_max):
+        for y in range(y_min, y_max):
+            tile_y = (y + max_tile) % max_tile
+            if reverse_y:
+                tile_y = max_tile - tile_y - 1
+            keys.append((zoom, (x + max_tile) % max_tile, tile_y))
+    return keys
+
+
+def create_static_map(width, height, tile_source, **options):
+    """
+    Build a staticmap.StaticMap whose tiles come from tile_source
+    instead of staticmap's own HTTP client.
+
+    render() picks the view itself and fetches every tile in one batch
+    before staticmap draws anything: if one is missing it raises
+    TilesUnavailable at once, so staticmap never runs its retry rounds.
+    Only public staticmap methods (render, get, determine_extent) are used.
+    """
+    from staticmap import StaticMap
+
+    class CachedStaticMap(StaticMap):
+        def render(self, zoom=None, center=None):
+            if zoom is None or center is None:
+                zoom, center = fit_view(self)
+            keys = visible_tiles(self.width, self.height, zoom, center,
+                                 self.tile_size, self.reverse_y)
+            self.prefetched = tile_source.get_many(keys)
+            missing = [key for key, data in self.prefetched.items() if data is None]
+            if missing:
+                raise TilesUnavailable(f"{len(missing)}/{len(keys)} tuiles indisponibles")
+            return super().render(zoom=zoom, center=center)
+
+        def get(self, url, **kwargs):
+            key = tuple(int(part) for part in url.split("/"))
+            data = self.prefetched.get(key)
+            if data is None:
+                data = tile_source.get_tile(*key)
+            return (200, data) if data is not None else (404, None)
+
+    options.setdefault("delay_between_retries", 0)
+    return CachedStaticMap(width, height, url_template=TILE_KEY_TEMPLATE, **options)
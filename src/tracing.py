@@ -0,0 +1,187 @@
+import cProfile
+import heapq
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Pipeline stages, in display order, with their label on the results page
+STAGE_LABELS = {
+    "discovery": "Découverte",
+    "copy": "Copie",
+    "exif": "EXIF",
+    "conversion": "Conversion",
+    "thumbnails": "Miniatures",
+    "html_map": "Carte HTML",
+    "preview": "Aperçu",
+    "display": "Affichage",
+}
+
+
+class Tracer:
+    """
+    Per-run timing of the itinerary pipeline.
+
+    span() times a block and records it as a trace event; add() accumulates
+    time spent in many small calls (discovery, conversion) without one event
+    each. Stage totals are wall-clock time.
+    record_file() keeps per-file times apart: for work done by parallel
+    workers (EXIF) their sum is CPU-like time across threads, so it is
+    reported separately (file_breakdown) and never added to a stage total;
+    the slowest files of each stage are kept as outliers.
+    profile=True runs cProfile around the blocks wrapped in profiling().
+    Thread-safe: spans can be recorded from the worker and the UI threads.
+    """
+
+    def __init__(self, profile=False, max_outliers=10):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.totals = {}
+        self.file_totals = {}
+        self.slowest = {}
+        self.max_outliers = max_outliers
+        self.profiler = cProfile.Profile() if profile else None
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, count=1):
+        """Accumulate seconds (over count items) into a stage total"""
+        with self._lock:
+            total = self.totals.setdefault(stage, [0.0, 0])
+            total[0] += seconds
+            total[1] += count
+
+    @contextmanager
+    def span(self, stage, **args):
+        """Time the wrapped block as one event of stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.add(stage, seconds)
+            with self._lock:
+                self.events.append({
+                    "name": stage,
+                    "start": start - self.origin,
+                    "seconds": seconds,
+                    "thread": threading.get_ident(),
+                    "args": args,
+                })
+
+    def record_file(self, stage, path, seconds):
+        """Per-file timing: summed apart from the stage's wall-clock total, slowest files kept"""
+        with self._lock:
+            total = self.file_totals.setdefault(stage, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+            heap = self.slowest.setdefault(stage, [])
+            if len(heap) < self.max_outliers:
+                heapq.heappush(heap, (seconds, path))
+            elif seconds > heap[0][0]:
+                heapq.heapreplace(heap, (seconds, path))
+
+    @contextmanager
+    def profiling(self):
+        """
+        Run cProfile around the wrapped block (no-op unless profile=True).
+        cProfile only sees the thread that entered the block: work done by
+        pool threads or processes (EXIF extraction) is not in the profile;
+        see the per-file totals and outliers for it.
+        """
+        if self.profiler is None:
+            yield
+            return
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+
+    def breakdown(self):
+        """[(stage, seconds, count)] with the known stages first, in pipeline order"""
+        with self._lock:
+            totals = dict(self.totals)
+        order = list(STAGE_LABELS) + sorted(set(totals) - set(STAGE_LABELS))
+        return [(stage, totals[stage][0], totals[stage][1]) for stage in order if stage in totals]
+
+    def file_breakdown(self):
+        """[(stage, summed per-file seconds, files)], in pipeline order"""
+        with self._lock:
+            totals = dict(self.file_totals)
+        order = list(STAGE_LABELS) + sorted(set(totals) - set(STAGE_LABELS))
+        return [(stage, totals[stage][0], totals[stage][1]) for stage in order if stage in totals]
+
+    def outliers(self):
+        """{stage: [(path, seconds)]}, slowest first"""
+        with self._lock:
+            return {stage: [(path, seconds) for seconds, path in sorted(heap, reverse=True)]
+                    for stage, heap in self.slowest.items()}
+
+    def format_breakdown(self):
+        """
+        Compact one-line breakdown for the results page: wall-clock stages,
+        then the per-file sums (time added up over parallel workers)
+        """
+        parts = [f"{STAGE_LABELS.get(stage, stage)} {format_seconds(seconds)}"
+                 for stage, seconds, _ in self.breakdown()]
+        text = "  •  ".join(parts)
+        per_file = [f"{STAGE_LABELS.get(stage, stage)} {format_seconds(seconds)}"
+                    for stage, seconds, _ in self.file_breakdown()]
+        if per_file:
+            text += f"  (cumul par fichier : {', '.join(per_file)})"
+        return text
+
+    def to_dict(self):
+        return {
+            "stages": [{"stage": stage, "seconds": seconds, "count": count}
+                       for stage, seconds, count in self.breakdown()],
+            "per_file": [{"stage": stage, "seconds": seconds, "count": count}
+                         for stage, seconds, count in self.file_breakdown()],
+            "outliers": {stage: [{"path": path, "seconds": seconds} for path, seconds in files]
+                         for stage, files in self.outliers().items()},
+            "spans": list(self.events),
+        }
+
+    def to_chrome_trace(self):
+        """Trace Event Format, loadable in chrome://tracing or Perfetto"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        trace_events = [{
+            "name": STAGE_LABELS.get(event["name"], event["name"]),
+            "cat": event["name"],
+            "ph": "X",
+            "ts": event["start"] * 1e6,
+            "dur": event["seconds"] * 1e6,
+            "pid": pid,
+            "tid": event["thread"],
+            "args": event["args"],
+        } for event in events]
+        summary = self.to_dict()
+        del summary["spans"]
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms", "otherData": summary}
+
+    def export(self, path, fmt="chrome"):
+        """
+        Write the run's trace to path: fmt "chrome" (Trace Event Format) or
+        "json" (stages, outliers and spans). With profiling enabled, the
+        cProfile stats are written next to it (.prof).
+        """
+        data = self.to_chrome_trace() if fmt == "chrome" else self.to_dict()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, ensure_ascii=False, default=str)
+
+        if self.profiler is not None:
+            self.profiler.dump_stats(os.path.splitext(path)[0] + ".prof")
+        return path
+
+
+def format_seconds(seconds):
+    return f"{seconds * 1000:.0f} ms" if seconds < 1 else f"{seconds:.1f} s"
+
+
+def profiling_requested():
+    """cProfile is opt-in: set LOCALY_PROFILE=1"""
+    return os.environ.get("LOCALY_PROFILE", "") not in ("", "0")
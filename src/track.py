@@ -0,0 +1,116 @@
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Timestamp value used for photos without a date (sorts first, like "")
+MISSING_TIMESTAMP = np.iinfo(np.int64).min
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def datetime_to_epoch(dt):
+    """Naive EXIF datetime -> integer seconds (wall clock, no timezone)"""
+    return (dt - EPOCH) // timedelta(seconds=1)
+
+
+def epoch_to_datetime(seconds):
+    """Inverse of datetime_to_epoch"""
+    return EPOCH + timedelta(seconds=int(seconds))
+
+
+def parse_timestamp(value):
+    """ISO string / datetime / None -> epoch seconds or MISSING_TIMESTAMP"""
+    if not value:
+        return MISSING_TIMESTAMP
+    if isinstance(value, datetime):
+        return datetime_to_epoch(value)
+    try:
+        return datetime_to_epoch(datetime.fromisoformat(value))
+    except (TypeError, ValueError):
+        return MISSING_TIMESTAMP
+
+
+class PhotoTrack:
+    """
+    Columnar, time-sorted container for geotagged photos.
+    lat/lon are float64 arrays, timestamps int64 epoch seconds
+    (MISSING_TIMESTAMP when unknown) and filenames interned strings.
+    paths are the photos' file paths (the filenames when unknown): unlike
+    display filenames they identify a photo.
+    Built once and shared by every renderer.
+    """
+
+    __slots__ = ("lat", "lon", "timestamps", "filenames", "paths")
+
+    def __init__(self, lat, lon, timestamps, filenames, presorted=False, paths=None):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        filenames = [sys.intern(name) for name in filenames]
+        paths = list(paths) if paths is not None else filenames
+
+        if not presorted and len(timestamps) > 1:
+            order = np.argsort(timestamps, kind="stable")
+            lat, lon, timestamps = lat[order], lon[order], timestamps[order]
+            filenames = [filenames[i] for i in order]
+            paths = [paths[i] for i in order]
+
+        self.lat = lat
+        self.lon = lon
+        self.timestamps = timestamps
+        self.filenames = filenames
+        self.paths = paths
+
+    @classmethod
+    def from_points(cls, photo_points):
+        """Build a track from photo point dicts (filename, latitude, longitude, timestamp)"""
+        return cls(
+            [p["latitude"] for p in photo_points],
+            [p["longitude"] for p in photo_points],
+            [parse_timestamp(p.get("timestamp")) for p in photo_points],
+            [p.get("filename", "") for p in photo_points],
+            paths=[p.get("path") or p.get("filename", "") for p in photo_points],
+        )
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def has_timestamp(self, i):
+        return self.timestamps[i] != MISSING_TIMESTAMP
+
+    def datetime_at(self, i):
+        """Timestamp of point i as a datetime, or None"""
+        if not self.has_timestamp(i):
+            return None
+        return epoch_to_datetime(self.timestamps[i])
+
+    def coordinates(self):
+        """[[lat, lon], ...] as plain Python floats (for folium)"""
+        return np.column_stack((self.lat, self.lon)).tolist()
+
+    def bounds(self):
+        """(min_lat, max_lat, min_lon, max_lon)"""
+        return (float(self.lat.min()), float(self.lat.max()),
+                float(self.lon.min()), float(self.lon.max()))
+
+    def to_points(self):
+        """Back to the photo point dicts used by the UI"""
+        points = []
+        for i, (lat, lon) in enumerate(zip(self.lat.tolist(), self.lon.tolist())):
+            dt = self.datetime_at(i)
+            points.append({
+                "path": self.paths[i],
+                "filename": self.filenames[i],
+                "latitude": lat,
+                "longitude": lon,
+                "timestamp": dt.isoformat() if dt else ""
+            })
+        return points
+
+
+def as_track(photo_points):
+    """Accept a PhotoTrack or a list of photo point dicts"""
+    if isinstance(photo_points, PhotoTrack):
+        return photo_points
+    return PhotoTrack.from_points(photo_points)
@@ -1,27 +1,56 @@
 import customtkinter as ctk
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from tkinter import Label, filedialog
 import os
 import sys
-import threading
+import time
 import webbrowser
-import io
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from file_manager import get_images_from_paths, copy_images_to_data, ensure_output_folder
-from image_handler import lire_exif, extraire_gps_brut, extraire_timestamp
-from gps_utils import convertir_gps
-from map_plotter import generate_itinerary_map, generate_static_map_image
+from job_queue import JobQueue
+from jobs import DONE
+from pipeline import ItineraryError
+from tracing import Tracer, profiling_requested
+from ui.preview_cache import DEFAULT_PREVIEW_CACHE
+
+TRACE_FILENAME = "pipeline_trace.json"
+
+# Preview size before the container is laid out, and the largest useful one
+# (the size previews are rendered at)
+DEFAULT_PREVIEW_SIZE = (600, 350)
+MAX_PREVIEW_SIZE = (800, 600)
+# Target sizes are rounded to this step so a window drag reuses cached sizes
+PREVIEW_SIZE_STEP = 20
 
 class ItineraryResultsApp:
-    def __init__(self, root, file_paths, on_back_callback):
+    def __init__(self, root, file_paths, on_back_callback, ingestion_mode="reference", archive=True,
+                 job_queue=None):
+        """
+        ingestion_mode: "reference" reads metadata from the original paths and
+        archives afterwards (if archive is True) in a low-priority thread;
+        "copy" stores every image in data/images before reading it.
+        job_queue: shared JobQueue running the itinerary (the page creates
+        its own if None); outputs go to the job's own folder.
+        """
         self.root = root
         self.file_paths = file_paths
         self.on_back_callback = on_back_callback
+        self.ingestion_mode = ingestion_mode
+        self.archive = archive
         self.map_path = None
         self.map_image_path = None
         self.photo_points = []
+        self.preview_frame = None
+        self.preview_label = None
+        self.preview_image_path = None
+        self.preview_image = None
+        self.preview_size = None
+        self.resize_after_id = None
+        self.job = None
+        self.job_queue = job_queue or JobQueue(max_concurrent=1, root=root)
+        # Per-stage timings of the current run (cProfile with LOCALY_PROFILE=1)
+        self.tracer = Tracer(profile=profiling_requested())
         self.setup_ui()
         # Start processing in background
         self.process_images()
@@ -57,10 +86,16 @@ class ItineraryResultsApp:
         map_title = ctk.CTkLabel(map_header, text="Votre Itinéraire", 
                                  font=("Arial", 16, "bold"), text_color="#1f2937")
         map_title.pack(anchor="w")
+
+        # Per-stage counts, kept visible while provisional maps are shown
+        self.stage_label = ctk.CTkLabel(map_header, text="", font=("Arial", 10),
+                                        text_color="#9ca3af", anchor="w")
+        self.stage_label.pack(anchor="w")
         
         # Map container
         self.map_container = ctk.CTkFrame(self.root, fg_color="transparent")
         self.map_container.pack(fill="both", expand=True, padx=20, pady=(0, 15))
+        self.map_container.bind("<Configure>", self.on_container_resize)
         
         # Loading placeholder
         self.loading_frame = ctk.CTkFrame(self.map_container, fg_color="#f3f4f6", 
@@ -95,86 +130,99 @@ class ItineraryResultsApp:
         exit_btn.pack()
     
     def process_images(self):
-        """Process images in background thread"""
-        def process():
-            try:
-                # Update status
-                self.root.after(0, lambda: self.status_label.configure(
-                    text="Extraction des données GPS..."))
-                
-                # Get valid images from paths
-                images = get_images_from_paths(self.file_paths)
-                
-                if len(images) < 3:
-                    self.root.after(0, lambda: self.show_error(
-                        "Pas assez d'images valides trouvées (minimum 3)"))
-                    return
-                
-                # Copy images to data folder
-                ensure_output_folder("data/images")
-                copied_images = copy_images_to_data(images, "data/images")
-                
-                # Extract GPS data with timestamps
-                for img_path in copied_images:
-                    exif = lire_exif(img_path)
-                    gps_brut = extraire_gps_brut(exif)
-                    coords = convertir_gps(gps_brut) if gps_brut else None
-                    timestamp = extraire_timestamp(exif)
-                    
-                    if coords:
-                        lat, lon = coords
-                        self.photo_points.append({
-                            "filename": os.path.basename(img_path),
-                            "latitude": lat,
-                            "longitude": lon,
-                            "timestamp": timestamp.isoformat() if timestamp else ""
-                        })
-                
-                if len(self.photo_points) < 2:
-                    self.root.after(0, lambda: self.show_error(
-                        "Pas assez de données GPS trouvées dans les images (minimum 2)"))
-                    return
-                
-                # Update status
-                self.root.after(0, lambda: self.status_label.configure(
-                    text="Génération de la carte..."))
-                
-                # Generate map
-                ensure_output_folder("data/output")
-                map_path = generate_itinerary_map(self.photo_points, "data/output/route_map.html")
-                
-                # Update status
-                self.root.after(0, lambda: self.status_label.configure(
-                    text="Création de l'aperçu..."))
-                
-                # Generate static map image
-                map_image_path = generate_static_map_image(self.photo_points, "data/output/map_preview.png")
-                
-                # Display map preview
-                self.root.after(0, lambda: self.display_map_preview(map_path, map_image_path))
-                
-            except Exception as e:
-                import traceback
-                error_msg = f"Erreur lors du traitement: {str(e)}"
-                print(traceback.format_exc())
-                self.root.after(0, lambda: self.show_error(error_msg))
-        
-        thread = threading.Thread(target=process, daemon=True)
-        thread.start()
+        """Submit the itinerary job; its callbacks arrive on the Tk thread"""
+        self.job = self.job_queue.submit(
+            self.file_paths,
+            ingestion_mode=self.ingestion_mode,
+            archive=self.archive,
+            tracer=self.tracer,
+            on_status=self.set_status,
+            on_preview=lambda map_path, image: self.display_map_preview(
+                map_path, None, provisional=True, image=image),
+            on_done=self.on_job_done
+        )
+
+    def add_photos(self):
+        """Append photos to the current itinerary: only the new ones are read"""
+        files = filedialog.askopenfilenames(
+            title="Sélectionner des Photos",
+            filetypes=[("Fichiers image", "*.jpg *.jpeg *.JPG *.JPEG"), ("Tous les fichiers", "*.*")]
+        )
+        if not files:
+            return
+        self.tracer = Tracer(profile=profiling_requested())
+        self.set_status("Ajout des photos...")
+        self.job = self.job_queue.append(
+            os.path.basename(self.job.output_dir),
+            list(files),
+            ingestion_mode=self.ingestion_mode,
+            archive=self.archive,
+            tracer=self.tracer,
+            on_status=self.set_status,
+            on_done=self.on_job_done
+        )
+
+    def on_job_done(self, job):
+        """Show the job's map, or its error"""
+        if job.status == DONE:
+            self.photo_points = job.result["points"]
+            self.finish_run(job.result["map_path"], job.result["map_image_path"],
+                            job.result["map_image"])
+        elif isinstance(job.error, ItineraryError) and self.map_path is not None:
+            # Photos added to a shown itinerary: keep its map
+            self.set_status(str(job.error))
+        elif isinstance(job.error, ItineraryError):
+            self.show_error(str(job.error))
+        elif job.error is not None:
+            import traceback
+            print("".join(traceback.format_exception(job.error)))
+            self.show_error(f"Erreur lors du traitement: {str(job.error)}")
     
-    def display_map_preview(self, map_path, map_image_path):
-        """Display clickable map preview image"""
+    def finish_run(self, map_path, map_image_path, map_image=None):
+        """Display the final preview, then (once it is shown) the timing breakdown of the run"""
+        started = time.perf_counter()
+
+        def shown():
+            # Scaling happens on a worker: timed up to the preview being on screen
+            self.tracer.add("display", time.perf_counter() - started)
+            self.report_timings()
+
+        self.display_map_preview(map_path, map_image_path, image=map_image, on_shown=shown)
+
+    def report_timings(self):
+        """Timing breakdown in the map header, slow files and trace export"""
+        if self.stage_label.winfo_exists():
+            self.stage_label.configure(text="⏱  " + self.tracer.format_breakdown())
+        for path, seconds in self.tracer.outliers().get("exif", [])[:3]:
+            print(f"Lecture lente : {path} ({seconds * 1000:.0f} ms)")
         try:
-            print(f"DEBUG: Attempting to display map preview")
-            print(f"DEBUG: Map path: {map_path}")
-            print(f"DEBUG: Image path: {map_image_path}")
-            print(f"DEBUG: Image exists: {os.path.exists(map_image_path) if map_image_path else False}")
-            
-            # Remove loading frame
-            self.loading_frame.destroy()
+            self.tracer.export(os.path.join(self.job.output_dir, TRACE_FILENAME))
+        except OSError as e:
+            print(f"Erreur lors de l'export des temps: {e}")
+
+    def set_status(self, text):
+        """Show pipeline progress in the loading placeholder and the map header"""
+        for label in (self.status_label, self.stage_label):
+            if label.winfo_exists():
+                label.configure(text=text)
+
+    def display_map_preview(self, map_path, map_image_path, provisional=False, image=None,
+                            on_shown=None):
+        """
+        Display clickable map preview image.
+        Can be called repeatedly: each call replaces the previous preview.
+        image: the preview as a PIL image (saves reading map_image_path back).
+        on_shown() is called once the preview (or its fallback) is displayed.
+        """
+        try:
+            # Remove loading frame and any earlier (provisional) preview
+            if self.loading_frame.winfo_exists():
+                self.loading_frame.destroy()
+            if self.preview_frame is not None and self.preview_frame.winfo_exists():
+                self.preview_frame.destroy()
             
             # Create preview frame (clickable)
-            preview_frame = ctk.CTkFrame(self.map_container, fg_color="white", 
+            preview_frame = self.preview_frame = ctk.CTkFrame(self.map_container, fg_color="white", 
                                         border_width=2, border_color="#d1d5db", 
                                         corner_radius=12, cursor="hand2")
             preview_frame.pack(fill="both", expand=True)
@@ -183,58 +231,25 @@ class ItineraryResultsApp:
             preview_frame.bind("<Button-1>", lambda e: self.open_map_in_browser(map_path))
             
             # Load and display the map image
-            if map_image_path and os.path.exists(map_image_path):
-                print(f"DEBUG: Loading image from: {map_image_path}")
-                try:
-                    # Load image with PIL
-                    from PIL import Image as PILImage
-                    pil_image = PILImage.open(map_image_path)
-                    print(f"DEBUG: Image loaded successfully, size: {pil_image.size}")
-                    
-                    # Calculate size to fit in container
-                    max_width = 600
-                    max_height = 350
-                    
-                    img_width, img_height = pil_image.size
-                    scale = min(max_width / img_width, max_height / img_height)
-                    
-                    new_width = int(img_width * scale)
-                    new_height = int(img_height * scale)
-                    
-                    # Resize image
-                    pil_image = pil_image.resize((new_width, new_height), PILImage.Resampling.LANCZOS)
-                    print(f"DEBUG: Image resized to: {new_width}x{new_height}")
-                    
-                    # Convert PIL image to PhotoImage for tkinter
-                    from PIL import ImageTk
-                    photo = ImageTk.PhotoImage(pil_image)
-                    
-                    # Create label with image using tkinter's Label (not CTkLabel for images)
-                    from tkinter import Label
-                    image_label = Label(
-                        preview_frame, 
-                        image=photo,
-                        bg='white',
-                        cursor="hand2"
-                    )
-                    image_label.image = photo  # Keep a reference!
-                    image_label.pack(pady=20, padx=20)
-                    image_label.bind("<Button-1>", lambda e: self.open_map_in_browser(map_path))
-                    print(f"DEBUG: Image displayed successfully")
-                    
-                except Exception as img_error:
-                    print(f"ERROR loading/displaying image: {img_error}")
-                    import traceback
-                    traceback.print_exc()
-                    self.display_map_summary_fallback(preview_frame, map_path)
+            if image is not None or (map_image_path and os.path.exists(map_image_path)):
+                # Empty label first: the preview is decoded and scaled on a worker
+                image_label = Label(preview_frame, bg='white', cursor="hand2")
+                image_label.pack(pady=20, padx=20)
+                image_label.bind("<Button-1>", lambda e: self.open_map_in_browser(map_path))
+                self.preview_label = image_label
+                self.preview_image_path = map_image_path
+                self.preview_image = image
+                self.show_preview_image(map_path, on_shown)
                 
                 # Overlay "Click to view" hint
                 hint_frame = ctk.CTkFrame(preview_frame, fg_color="#173DED", 
                                          corner_radius=8)
                 hint_frame.place(relx=0.5, rely=0.95, anchor="center")
                 
+                hint_text = ("⏳  Aperçu provisoire, affinage en cours..." if provisional
+                             else "🌐  Cliquez pour ouvrir la carte interactive")
                 hint_label = ctk.CTkLabel(hint_frame, 
-                                         text="🌐  Cliquez pour ouvrir la carte interactive", 
+                                         text=hint_text, 
                                          font=("Arial", 11, "bold"), 
                                          text_color="white", fg_color="transparent")
                 hint_label.pack(padx=15, pady=8)
@@ -242,8 +257,9 @@ class ItineraryResultsApp:
                 hint_label.bind("<Button-1>", lambda e: self.open_map_in_browser(map_path))
             else:
                 # Fallback if image generation failed
-                print(f"DEBUG: Image not found, showing fallback")
                 self.display_map_summary_fallback(preview_frame, map_path)
+                if on_shown:
+                    on_shown()
             
             self.map_path = map_path
             self.map_image_path = map_image_path
@@ -273,12 +289,73 @@ class ItineraryResultsApp:
                                      height=40, width=150, cursor="hand2",
                                      command=lambda: self.open_map_in_browser(map_path))
             open_btn.pack(side="left", padx=5)
+
+            # Add photos to this itinerary (once its final map is there)
+            if not provisional:
+                add_btn = ctk.CTkButton(btn_container, text="Ajouter des Photos",
+                                        font=("Arial", 11, "bold"),
+                                        fg_color="#10b981", text_color="white",
+                                        hover_color="#059669", corner_radius=12,
+                                        height=40, width=150, cursor="hand2",
+                                        command=self.add_photos)
+                add_btn.pack(side="left", padx=5)
             
         except Exception as e:
             import traceback
             print(traceback.format_exc())
             self.show_error(f"Erreur d'affichage: {str(e)}")
     
+    def preview_target_size(self):
+        """Largest preview fitting in the map container (rounded to PREVIEW_SIZE_STEP)"""
+        width = self.map_container.winfo_width()
+        height = self.map_container.winfo_height()
+        if width <= 1 or height <= 1:
+            return DEFAULT_PREVIEW_SIZE
+        # Room for the frame padding and the "click to view" hint
+        width = min(MAX_PREVIEW_SIZE[0], width - 40)
+        height = min(MAX_PREVIEW_SIZE[1], height - 80)
+        step = PREVIEW_SIZE_STEP
+        return max(step, width // step * step), max(step, height // step * step)
+
+    def show_preview_image(self, map_path, on_shown=None):
+        """Show the current preview at the container's size (cached per size)"""
+        label = self.preview_label
+        image_path = self.preview_image_path
+        size = self.preview_target_size()
+        self.preview_size = size
+
+        def show(photo):
+            # A newer preview may have replaced this one meanwhile
+            if label is self.preview_label and label.winfo_exists():
+                label.configure(image=photo)
+                label.image = photo  # Keep a reference!
+                if on_shown:
+                    on_shown()
+
+        def failed(error):
+            print(f"ERROR loading/displaying image: {error}")
+            if label is self.preview_label and label.winfo_exists():
+                label.destroy()
+                self.display_map_summary_fallback(self.preview_frame, map_path)
+                if on_shown:
+                    on_shown()
+
+        DEFAULT_PREVIEW_CACHE.request(self.root, image_path, size, show, on_error=failed,
+                                      image=self.preview_image)
+
+    def on_container_resize(self, event):
+        """Re-fit the preview once the window stopped resizing"""
+        if self.resize_after_id is not None:
+            self.root.after_cancel(self.resize_after_id)
+        self.resize_after_id = self.root.after(150, self.refit_preview)
+
+    def refit_preview(self):
+        self.resize_after_id = None
+        if self.preview_label is None or not self.preview_label.winfo_exists():
+            return
+        if self.preview_target_size() != self.preview_size:
+            self.show_preview_image(self.map_path)
+
     def display_map_summary_fallback(self, parent_frame, map_path):
         """Fallback display if image preview fails"""
         content_frame = ctk.CTkFrame(parent_frame, fg_color="transparent")
@@ -315,6 +392,10 @@ class ItineraryResultsApp:
     
     def open_map_in_browser(self, map_path):
         """Open the map HTML file in default browser"""
+        if not os.path.exists(map_path):
+            # Provisional previews come before the interactive map is written
+            print("La carte interactive n'est pas encore prête")
+            return
         try:
             abs_path = os.path.abspath(map_path)
             webbrowser.open('file://' + abs_path)
@@ -323,6 +404,15 @@ class ItineraryResultsApp:
     
     def show_error(self, message):
         """Show error message"""
+        # A provisional preview may have replaced the loading frame
+        if not self.loading_frame.winfo_exists():
+            for widget in self.map_container.winfo_children():
+                widget.destroy()
+            self.loading_frame = ctk.CTkFrame(self.map_container, fg_color="#f3f4f6",
+                                              border_width=2, border_color="#d1d5db",
+                                              corner_radius=12)
+            self.loading_frame.pack(fill="both", expand=True)
+
         # Clear loading content
         for widget in self.loading_frame.winfo_children():
             widget.destroy()
@@ -342,6 +432,7 @@ class ItineraryResultsApp:
         error_label.pack(pady=(10, 0))
     
     def go_back_to_upload(self):
-        """Return to upload photos page"""
+        """Return to upload photos page (stops the processing still running)"""
+        self.job.cancel()
         if self.on_back_callback:
             self.on_back_callback()
\ No newline at end of file
@@ -0,0 +1,106 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageTk
+
+
+def fit_size(image_size, target_size):
+    """Largest size with the image's aspect ratio that fits in target_size"""
+    img_width, img_height = image_size
+    max_width, max_height = target_size
+    scale = min(max_width / img_width, max_height / img_height)
+    return max(1, int(img_width * scale)), max(1, int(img_height * scale))
+
+
+class PreviewCache:
+    """
+    Map previews scaled to the size they are displayed at.
+
+    The preview is LANCZOS-resampled on a worker thread, from the PIL image
+    the pipeline rendered when it is given (else the PNG is decoded there
+    too); only the PhotoImage creation (which Tk requires) happens on the
+    Tk thread. The PhotoImages are kept per (file, modification time, size),
+    so resizing the window back or revisiting a page reuses them without
+    any work.
+    """
+
+    def __init__(self, max_entries=12):
+        self.max_entries = max_entries
+        self.photos = OrderedDict()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview")
+        self.lock = threading.Lock()
+
+    def key(self, image_path, target_size):
+        try:
+            mtime_ns = os.stat(image_path).st_mtime_ns
+        except OSError:
+            return None
+        return (os.path.abspath(image_path), mtime_ns, tuple(target_size))
+
+    def cached(self, image_path, target_size):
+        """The PhotoImage for this file and size, if already built"""
+        key = self.key(image_path, target_size)
+        with self.lock:
+            photo = self.photos.get(key)
+            if photo is not None:
+                self.photos.move_to_end(key)
+        return photo
+
+    def request(self, root, image_path, target_size, callback, on_error=None, image=None):
+        """
+        Call callback(photo) on the Tk thread with the preview fitted to
+        target_size: immediately when cached, else once a worker resampled it.
+        on_error(exception) is called (on the Tk thread) if loading fails.
+        image: the preview already in memory (image_path is then only the
+        cache key; provisional previews have no file and are not cached).
+        """
+        key = self.key(image_path, target_size) if image_path else None
+        photo = self.cached(image_path, target_size) if key is not None else None
+        if photo is not None:
+            callback(photo)
+            return
+
+        def post(callback):
+            try:
+                root.after(0, callback)
+            except Exception:
+                # The window was closed while the preview was being scaled
+                pass
+
+        def resample():
+            try:
+                if image is not None:
+                    size = fit_size(image.size, target_size)
+                    resized = image.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+                else:
+                    with Image.open(image_path) as decoded:
+                        decoded.load()
+                        size = fit_size(decoded.size, target_size)
+                        resized = decoded.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+            except Exception as e:
+                if on_error:
+                    post(lambda: on_error(e))
+                return
+            post(lambda: deliver(resized))
+
+        def deliver(resized):
+            # PhotoImage must be created on the Tk thread
+            photo = ImageTk.PhotoImage(resized)
+            if key is not None:
+                with self.lock:
+                    self.photos[key] = photo
+                    self.photos.move_to_end(key)
+                    while len(self.photos) > self.max_entries:
+                        self.photos.popitem(last=False)
+            callback(photo)
+
+        self.executor.submit(resample)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared by the result pages, so revisiting one reuses its previews
+DEFAULT_PREVIEW_CACHE = PreviewCache()
@@ -1,17 +1,38 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
+from PIL import Image
 import os
-import threading
-import time
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion import IngestionScheduler, COMPLETED, FAILED
+from metadata_cache import MetadataCache
+from thumbnails import ThumbnailService
+
+# Progress widgets are refreshed at most this often (about 15 frames/s)
+PROGRESS_INTERVAL_MS = 66
+
+# Thumbnail size in the file list
+LIST_THUMBNAIL_SIZE = (40, 40)
 
 class PhotoUploadApp:
-    def __init__(self, root, on_submit_callback):
+    def __init__(self, root, on_submit_callback, thumbnails=None):
         self.root = root
         self.on_submit_callback = on_submit_callback
         self.uploaded_files = []
+        self.files_by_path = {}
         self.file_widgets = []
         self.error_frame = None
+        # One bounded pool validates, hashes and prefetches metadata for every file
+        self.cache = MetadataCache()
+        self.scheduler = IngestionScheduler(cache=self.cache)
+        self.owns_thumbnails = thumbnails is None
+        self.thumbnails = thumbnails or ThumbnailService()
+        self.pending_thumbnails = {}
         self.setup_ui()
+        self.root.after(PROGRESS_INTERVAL_MS, self.flush_progress)
         
     def setup_ui(self):
         # Clear the window
@@ -117,7 +138,7 @@ class PhotoUploadApp:
         
         if files:
             for file_path in files:
-                if file_path not in [f['path'] for f in self.uploaded_files]:
+                if file_path not in self.files_by_path:
                     self.add_file(file_path)
     
     def add_file(self, file_path):
@@ -126,12 +147,6 @@ class PhotoUploadApp:
             file_name = os.path.basename(file_path)
             file_size = os.path.getsize(file_path)
             
-            # Check file size (500 MB limit)
-            if file_size > 500 * 1024 * 1024:
-                messagebox.showwarning("Fichier Trop Volumineux", 
-                                      f"{file_name} dépasse la limite de 500 Mo.")
-                return
-            
             file_info = {
                 'path': file_path,
                 'name': file_name,
@@ -141,13 +156,14 @@ class PhotoUploadApp:
             }
             
             self.uploaded_files.append(file_info)
+            self.files_by_path[file_path] = file_info
             self.create_file_widget(file_info)
             
             # Hide error frame when adding files
             self.hide_error()
             
-            # Simulate upload
-            self.simulate_upload(file_info)
+            # Validation, hashing and metadata prefetch run on the worker pool
+            self.scheduler.submit(file_path)
             
         except Exception as e:
             messagebox.showerror("Erreur", f"Échec de l'ajout du fichier: {str(e)}")
@@ -215,6 +231,7 @@ class PhotoUploadApp:
         
         # Store references
         file_info['widget'] = file_frame
+        file_info['icon_label'] = icon_label
         file_info['progress_bar'] = progress_bar
         file_info['status_label'] = status_label
         file_info['size_label'] = size_label
@@ -222,45 +239,78 @@ class PhotoUploadApp:
         
         self.file_widgets.append(file_frame)
     
-    def simulate_upload(self, file_info):
-        """Simulate file upload with progress"""
-        def upload():
-            try:
-                for i in range(101):
-                    if file_info['status'] == 'removed':
-                        return
-                    
-                    time.sleep(0.03)
-                    
-                    # Update progress bar
-                    file_info['progress_bar'].set(i / 100)
-                    
-                    # Update percentage
-                    file_info['percentage_label'].configure(text=f"{i}%")
-                    
-                    # Update size
-                    current_size = (file_info['size'] * i) / 100
-                    total_size = file_info['size']
-                    file_info['size_label'].configure(
-                        text=f"{self.format_file_size(current_size)} / {self.format_file_size(total_size)}"
-                    )
-                    
-                    if i == 100:
-                        file_info['status'] = 'completed'
-                        file_info['status_label'].configure(text="  •  Terminé", text_color="#10b981")
-                        
-            except Exception as e:
-                print(f"Erreur de téléchargement: {e}")
-        
-        thread = threading.Thread(target=upload, daemon=True)
-        thread.start()
+    def flush_progress(self):
+        """Apply the ingestion progress collected since the last frame (Tk thread)"""
+        if not self.submit_btn.winfo_exists():
+            return
+
+        for path, progress in self.scheduler.drain().items():
+            file_info = self.files_by_path.get(path)
+            if file_info is None or 'widget' not in file_info:
+                continue
+            self.update_file_widget(file_info, progress)
+
+        # Thumbnails generated since the last frame
+        for path, future in list(self.pending_thumbnails.items()):
+            if future.done():
+                del self.pending_thumbnails[path]
+                file_info = self.files_by_path.get(path)
+                if file_info is not None and not future.cancelled() and future.exception() is None:
+                    self.show_thumbnail(file_info, future.result())
+
+        self.root.after(PROGRESS_INTERVAL_MS, self.flush_progress)
+
+    def update_file_widget(self, file_info, progress):
+        """Show bytes processed and the final state of one file"""
+        total_size = progress['size'] or file_info['size']
+        fraction = progress['done'] / total_size if total_size else 1.0
+        file_info['progress_value'] = fraction
+
+        file_info['progress_bar'].set(fraction)
+        file_info['percentage_label'].configure(text=f"{int(fraction * 100)}%")
+        file_info['size_label'].configure(
+            text=f"{self.format_file_size(progress['done'])} / {self.format_file_size(total_size)}"
+        )
+
+        if progress['status'] == COMPLETED:
+            file_info['status'] = 'completed'
+            file_info['sha256'] = progress['sha256']
+            file_info['status_label'].configure(text="  •  Terminé", text_color="#10b981")
+            # Reuses the hash just computed: no second read of the file
+            self.pending_thumbnails[file_info['path']] = self.thumbnails.request(
+                file_info['path'], content_hash=progress['sha256'], size=LIST_THUMBNAIL_SIZE)
+        elif progress['status'] == FAILED:
+            file_info['status'] = 'error'
+            file_info['status_label'].configure(text=f"  •  Erreur : {progress['error']}",
+                                                text_color="#dc2626")
+
+    def show_thumbnail(self, file_info, thumbnail_path):
+        """Replace the file icon by the photo's thumbnail"""
+        if not thumbnail_path or not file_info['icon_label'].winfo_exists():
+            return
+        with Image.open(thumbnail_path) as thumbnail:
+            thumbnail.load()
+            image = ctk.CTkImage(light_image=thumbnail.copy(), size=thumbnail.size)
+        file_info['icon_label'].configure(image=image, text="")
+
+    def close_ingestion(self):
+        """Stop the worker pools and release the metadata cache"""
+        self.scheduler.shutdown()
+        self.cache.close()
+        for future in self.pending_thumbnails.values():
+            future.cancel()
+        self.pending_thumbnails.clear()
+        if self.owns_thumbnails:
+            self.thumbnails.close()
     
     def remove_file(self, file_info, widget):
         """Remove a file from the upload list"""
         file_info['status'] = 'removed'
+        self.scheduler.cancel(file_info['path'])
         widget.destroy()
         if file_info in self.uploaded_files:
             self.uploaded_files.remove(file_info)
+        self.files_by_path.pop(file_info['path'], None)
         if widget in self.file_widgets:
             self.file_widgets.remove(widget)
         # Hide error when removing files
@@ -310,6 +360,8 @@ class PhotoUploadApp:
         for path in file_paths:
             print(f"  - {path}")
         
+        self.close_ingestion()
+
         # Navigate to itinerary page
         if self.on_submit_callback:
             self.on_submit_callback(file_paths)
\ No newline at end of file
@@ -0,0 +1,72 @@
+import struct
+
+import pytest
+
+from exif_reader import lire_exif_entete, lire_ifd
+from image_handler import lire_exif
+from synthetic_photos import generate_photos
+
+
+def ifd(ordre, entrees, suivant=0):
+    """IFD bytes: entry count, 12-byte entries, next IFD offset"""
+    donnees = struct.pack(ordre + "H", len(entrees))
+    for tag, type_champ, nombre, valeur in entrees:
+        donnees += struct.pack(ordre + "HHI", tag, type_champ, nombre) + valeur
+    return donnees + struct.pack(ordre + "I", suivant)
+
+
+@pytest.fixture
+def photo(tmp_path):
+    return generate_photos(str(tmp_path), 1)[0]
+
+
+def test_lire_ifd_reads_short_and_offset_values():
+    tiff = ifd(">", [(1, 3, 1, struct.pack(">HH", 7, 0)),
+                     (2, 5, 1, struct.pack(">I", 30))]) + struct.pack(">II", 3, 4)
+    assert lire_ifd(tiff, ">", 0) == {1: 7, 2: (3, 4)}
+
+
+def test_lire_ifd_offset_past_the_end():
+    assert lire_ifd(b"\x00\x01", ">", 10) == {}
+
+
+def test_lire_ifd_entry_count_larger_than_data():
+    tiff = ifd(">", [(1, 3, 1, struct.pack(">HH", 7, 0))])
+    tiff = struct.pack(">H", 500) + tiff[2:]
+    assert lire_ifd(tiff, ">", 0) == {1: 7}
+
+
+def test_lire_ifd_value_offset_out_of_range():
+    tiff = ifd("<", [(2, 5, 1, struct.pack("<I", 4000))])
+    assert lire_ifd(tiff, "<", 0) == {}
+
+
+def test_lire_ifd_truncated_block():
+    tiff = ifd(">", [(1, 3, 1, struct.pack(">HH", 7, 0)), (2, 3, 1, struct.pack(">HH", 8, 0))])
+    assert lire_ifd(tiff[:14], ">", 0) == {1: 7}
+    assert lire_ifd(tiff[:5], ">", 0) == {}
+
+
+def test_header_reader_rejects_non_jpeg(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"pas une image")
+    with pytest.raises(ValueError):
+        lire_exif_entete(str(path))
+    # lire_exif falls back to Pillow, which finds no image: no EXIF
+    assert lire_exif(str(path)) == {}
+
+
+def test_header_reader_reads_gps(photo):
+    exif = lire_exif_entete(photo)
+    assert exif["GPSInfo"][1] == "N"
+    assert len(exif["GPSInfo"][2]) == 3
+
+
+@pytest.mark.parametrize("keep", [2, 6, 20, 60, 120])
+def test_truncated_jpeg_never_raises(tmp_path, photo, keep):
+    with open(photo, "rb") as f:
+        data = f.read()
+    path = tmp_path / "truncated.jpg"
+    path.write_bytes(data[:keep])
+    assert isinstance(lire_exif_entete(str(path)), dict)
+
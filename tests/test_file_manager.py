@@ -0,0 +1,74 @@
+import os
+import threading
+
+import file_manager
+from file_manager import copy_images_to_data, hash_file, load_store_index, place_in_store
+
+
+def write(path, content):
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = tmp_path / "store"
+    a = write(tmp_path / "a.jpg", b"same content")
+    b = write(tmp_path / "b.JPG", b"same content")
+    c = write(tmp_path / "c.jpg", b"other content")
+
+    stored = copy_images_to_data([a, b, c], str(store))
+
+    assert stored[0] == stored[1]
+    assert stored[0] != stored[2]
+    assert os.path.basename(stored[0]) == hash_file(a) + ".jpg"
+    assert sorted(name for name in os.listdir(store) if not name.startswith(".")) == sorted(
+        os.path.basename(path) for path in {stored[0], stored[2]})
+
+
+def test_unchanged_sources_are_not_rehashed(tmp_path, monkeypatch):
+    store = str(tmp_path / "store")
+    a = write(tmp_path / "a.jpg", b"content")
+    copy_images_to_data([a], store)
+    assert os.path.abspath(a) in load_store_index(store)
+
+    def rehash(path):
+        raise AssertionError(f"{path} hashed again")
+
+    monkeypatch.setattr(file_manager, "hash_file", rehash)
+    copy_images_to_data([a], store)
+
+
+def test_store_copy_is_independent_of_the_original(tmp_path):
+    store = str(tmp_path / "store")
+    a = write(tmp_path / "a.jpg", b"original")
+    stored = copy_images_to_data([a], store)[0]
+
+    with open(a, "r+b") as f:
+        f.write(b"EDITED")
+    with open(stored, "rb") as f:
+        assert f.read() == b"original"
+
+
+def test_existing_tmp_file_is_never_written_through(tmp_path):
+    source = write(tmp_path / "source.jpg", b"new content")
+    victim = write(tmp_path / "victim.jpg", b"do not touch")
+    destination = str(tmp_path / "stored.jpg")
+
+    # A stale tmp left by an interrupted run, hardlinked to another file
+    tmp_path_name = f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp"
+    os.link(victim, tmp_path_name)
+
+    place_in_store(source, destination)
+
+    with open(victim, "rb") as f:
+        assert f.read() == b"do not touch"
+    with open(destination, "rb") as f:
+        assert f.read() == b"new content"
+    assert not os.path.exists(tmp_path_name)
+
+
+def test_same_file_is_left_alone(tmp_path):
+    source = write(tmp_path / "source.jpg", b"content")
+    assert place_in_store(source, source) == "existing"
+    with open(source, "rb") as f:
+        assert f.read() == b"content"
@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+import job_queue
+from job_queue import JobQueue
+from jobs import DONE, Job, RUNNING
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(output_root=str(tmp_path / "jobs"), keep_jobs=2)
+    yield queue
+    queue.shutdown()
+
+
+def add_job(queue, status):
+    """A job of this queue, with its folder, in the given state"""
+    job_id = queue.create_job_folder()
+    job = Job(None, lambda token: None)
+    job.id = job_id
+    job.output_dir = os.path.join(queue.output_root, job_id)
+    job.status = status
+    queue.jobs[job_id] = job
+    return job_id
+
+
+def test_job_ids_are_unique_across_queues(tmp_path):
+    first = JobQueue(output_root=str(tmp_path / "jobs"))
+    second = JobQueue(output_root=str(tmp_path / "jobs"))
+    try:
+        ids = [queue.create_job_folder() for _ in range(5) for queue in (first, second)]
+    finally:
+        first.shutdown()
+        second.shutdown()
+    assert len(set(ids)) == len(ids)
+    assert all(job_queue.JOB_ID_PATTERN.match(job_id) for job_id in ids)
+
+
+def test_job_folder_taken_by_another_process(queue, monkeypatch):
+    os.makedirs(os.path.join(queue.output_root, "20250101-120000-001"))
+    ids = iter(["20250101-120000-001", "20250101-120000-002"])
+    monkeypatch.setattr(queue, "new_job_id", lambda: next(ids))
+    assert queue.create_job_folder() == "20250101-120000-002"
+
+
+def test_prune_keeps_running_jobs(queue):
+    running = add_job(queue, RUNNING)
+    finished = [add_job(queue, DONE) for _ in range(3)]
+
+    queue.prune()
+
+    folders = os.listdir(queue.output_root)
+    assert running in folders
+    assert running in queue.jobs
+    # The two newest folders are kept, older finished ones are deleted
+    assert sorted(folders) == sorted([running] + finished[-2:])
+    assert finished[0] not in queue.jobs
+
+
+def test_prune_leaves_recent_foreign_folders(queue):
+    foreign = os.path.join(queue.output_root, "20000101-000000-001")
+    stale = os.path.join(queue.output_root, "20000101-000000-002")
+    other = os.path.join(queue.output_root, "not-a-job")
+    for folder in (foreign, stale, other):
+        os.makedirs(folder)
+    old = time.time() - job_queue.FOREIGN_JOB_MIN_AGE_SECONDS - 60
+    os.utime(stale, (old, old))
+    for _ in range(2):
+        add_job(queue, DONE)
+
+    queue.prune()
+
+    assert os.path.isdir(foreign)
+    assert not os.path.exists(stale)
+    assert os.path.isdir(other)
@@ -0,0 +1,95 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from metadata_cache import MetadataCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"\xff\xd8\xff" + b"\x00" * 100)
+    return str(path)
+
+
+def result(path, coords=(45.0, 5.0), error=None):
+    return {"path": path, "coords": coords, "timestamp": datetime(2025, 1, 2, 3, 4, 5),
+            "error": error}
+
+
+def test_hit_while_unchanged(cache, photo):
+    cache.put(result(photo))
+    hit = cache.get(photo)
+    assert hit["coords"] == (45.0, 5.0)
+    assert hit["timestamp"] == datetime(2025, 1, 2, 3, 4, 5)
+
+
+def test_no_gps_is_cached(cache, photo):
+    cache.put(result(photo, coords=None))
+    assert cache.get(photo)["coords"] is None
+
+
+def test_mtime_change_invalidates(cache, photo):
+    cache.put(result(photo))
+    st = os.stat(photo)
+    os.utime(photo, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.get(photo) is None
+
+
+def test_size_change_invalidates(cache, photo):
+    cache.put(result(photo))
+    st = os.stat(photo)
+    with open(photo, "ab") as f:
+        f.write(b"\x00")
+    # Same mtime, different size
+    os.utime(photo, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert cache.get(photo) is None
+
+
+def test_deleted_file_is_a_miss(cache, photo):
+    cache.put(result(photo))
+    os.remove(photo)
+    assert cache.get(photo) is None
+
+
+def test_content_check_catches_same_size_and_mtime(tmp_path, photo):
+    cache = MetadataCache(str(tmp_path / "verified.sqlite"), verify_content=True)
+    try:
+        cache.put(result(photo))
+        st = os.stat(photo)
+        with open(photo, "r+b") as f:
+            f.seek(10)
+            f.write(b"\x01")
+        os.utime(photo, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert cache.get(photo) is None
+    finally:
+        cache.close()
+
+
+def test_failed_reads_are_not_cached(cache, photo):
+    cache.put(result(photo, coords=None, error="Lecture impossible"))
+    assert cache.get(photo) is None
+    assert len(cache) == 0
+
+
+def test_size_cap_evicts_least_recently_used(tmp_path):
+    cache = MetadataCache(str(tmp_path / "capped.sqlite"), max_entries=2)
+    try:
+        paths = []
+        for i in range(3):
+            path = tmp_path / f"p{i}.jpg"
+            path.write_bytes(b"x" * (i + 1))
+            paths.append(str(path))
+            cache.put(result(str(path)))
+        assert len(cache) == 2
+        assert cache.get(paths[0]) is None
+    finally:
+        cache.close()